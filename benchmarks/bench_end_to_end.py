@@ -0,0 +1,126 @@
+"""End-to-end throughput benchmark on synthetic packing slips.
+
+For each order count a synthetic slip PDF is generated (and kept in the
+work directory for later runs), then parsed, rendered to manufacturing
+labels and gift notes, and exported to CSV and Excel in a fresh Python
+process, so the peak RSS reported is that of one run.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_end_to_end [--orders 10 100 1000 10000] [--workers 4] [--backend layout]
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+from benchmarks.synthetic_slips import write_packing_slips
+from instrumentation import peak_rss_mb
+from towel_core import (
+    DEFAULT_BACKEND,
+    DEFAULT_PARSE_WORKERS,
+    EXTRACTION_BACKENDS,
+    count_pages,
+    export_csv,
+    export_xlsx,
+    gift_note_data,
+    label_records,
+    manufacturing_plan,
+    orders_to_dataframe,
+    parse_pdf_batch,
+    render_gift_notes,
+    render_manufacturing_labels,
+    render_sharded,
+)
+
+DEFAULT_ORDER_COUNTS = (10, 100, 1000, 10000)
+
+def measure(pdf_path, workers, backend):
+    """Run the whole pipeline on one PDF; returns timings and counts"""
+    with open(pdf_path, 'rb') as f:
+        pdf_bytes = f.read()
+    
+    start = time.perf_counter()
+    [(orders, error)] = parse_pdf_batch([pdf_bytes], workers=workers, backend=backend)
+    parse_seconds = time.perf_counter() - start
+    if error is not None:
+        raise RuntimeError(error)
+    
+    records = label_records(orders)
+    notes = [gift_note_data(record) for record in records if record['has_gift_note']]
+    
+    start = time.perf_counter()
+    render_sharded(render_manufacturing_labels, records, workers)
+    labels_seconds = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    render_sharded(render_gift_notes, notes, workers)
+    notes_seconds = time.perf_counter() - start
+    
+    start = time.perf_counter()
+    df = orders_to_dataframe(orders, records)
+    export_csv(df)
+    export_xlsx(df, manufacturing_plan(df))
+    export_seconds = time.perf_counter() - start
+    
+    return {
+        'pages': count_pages(BytesIO(pdf_bytes)),
+        'orders': len(orders),
+        'labels': len(records),
+        'notes': len(notes),
+        'parse_seconds': parse_seconds,
+        'labels_seconds': labels_seconds,
+        'notes_seconds': notes_seconds,
+        'export_seconds': export_seconds,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+def slip_pdf(work_dir, orders):
+    """Path of the synthetic slip PDF for an order count, generated once"""
+    path = os.path.join(work_dir, f'synthetic_{orders}_orders.pdf')
+    if not os.path.exists(path):
+        write_packing_slips(path, orders)
+    return path
+
+def rate(count, seconds):
+    return count / seconds if seconds else float('inf')
+
+def rss(mb):
+    """Peak RSS column; n/a where it cannot be read (Windows)"""
+    return 'n/a' if mb is None else f'{mb:.0f}'
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--orders', type=int, nargs='+', default=list(DEFAULT_ORDER_COUNTS))
+    parser.add_argument('--workers', type=int, default=DEFAULT_PARSE_WORKERS)
+    parser.add_argument('--backend', default=DEFAULT_BACKEND, choices=sorted(EXTRACTION_BACKENDS))
+    parser.add_argument('--work-dir', default=os.path.join(tempfile.gettempdir(), 'towel_benchmarks'),
+                        help="Where generated slip PDFs are kept between runs")
+    parser.add_argument('--measure', metavar='PDF', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    
+    if args.measure:
+        # Child process: one measurement, reported as JSON
+        print(json.dumps(measure(args.measure, args.workers, args.backend)))
+        return
+    
+    os.makedirs(args.work_dir, exist_ok=True)
+    print(f"{'orders':>7} {'pages':>7} {'labels':>7} {'parse pg/s':>11} {'labels/s':>9} "
+          f"{'notes/s':>8} {'export s':>9} {'peak RSS MiB':>13}")
+    for orders in args.orders:
+        pdf_path = slip_pdf(args.work_dir, orders)
+        child = subprocess.run(
+            [sys.executable, '-m', 'benchmarks.bench_end_to_end', '--measure', pdf_path,
+             '--workers', str(args.workers), '--backend', args.backend],
+            check=True, capture_output=True, text=True
+        )
+        r = json.loads(child.stdout.splitlines()[-1])
+        print(f"{r['orders']:>7} {r['pages']:>7} {r['labels']:>7} "
+              f"{rate(r['pages'], r['parse_seconds']):>11.1f} {rate(r['labels'], r['labels_seconds']):>9.0f} "
+              f"{rate(r['notes'], r['notes_seconds']):>8.0f} {r['export_seconds']:>9.2f} {rss(r['peak_rss_mb']):>13}")
+
+if __name__ == '__main__':
+    main()
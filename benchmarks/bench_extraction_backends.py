@@ -0,0 +1,67 @@
+"""Benchmark the text-extraction backends for speed and field agreement.
+
+Every backend parses the same packing slips; pages/second is reported
+together with the share of item fields that match the reference backend.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_extraction_backends slips.pdf [...] [--reference layout]
+"""
+import argparse
+import time
+
+from towel_core import DEFAULT_BACKEND, EXTRACTION_BACKENDS, iter_page_texts, stitch_orders
+
+ORDER_FIELDS = ('order_id', 'order_date', 'buyer_name', 'shipping_service')
+ITEM_FIELDS = ('sku', 'product_type', 'towel_color', 'quantity', 'font', 'font_color',
+               'customizations', 'gift_message')
+
+def field_values(orders):
+    """Flatten orders into {(order position, item position, field): value}"""
+    values = {}
+    for o, order in enumerate(orders):
+        for i, item in enumerate(order.items):
+            for field in ORDER_FIELDS:
+                values[(o, i, field)] = getattr(order, field)
+            for field in ITEM_FIELDS:
+                values[(o, i, field)] = getattr(item, field)
+    return values
+
+def run_backend(paths, backend):
+    """Parse every file with one backend: (pages, seconds, field values per file)"""
+    pages = 0
+    values = []
+    start = time.perf_counter()
+    for path in paths:
+        texts = list(iter_page_texts(path, backend=backend))
+        pages += len(texts)
+        values.append(field_values(stitch_orders(texts)))
+    return pages, time.perf_counter() - start, values
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('pdfs', nargs='+', help="Packing slip PDFs to parse")
+    parser.add_argument('--reference', default=DEFAULT_BACKEND, choices=sorted(EXTRACTION_BACKENDS))
+    args = parser.parse_args()
+    
+    results = {name: run_backend(args.pdfs, name) for name in EXTRACTION_BACKENDS}
+    reference = results[args.reference][2]
+    
+    print(f"{'backend':<10} {'pages':>6} {'seconds':>8} {'pages/s':>8} {'agreement':>10}  mismatched fields")
+    for name, (pages, seconds, values) in results.items():
+        total = matched = 0
+        mismatched = {}
+        for ref_file, file_values in zip(reference, values):
+            for key, expected in ref_file.items():
+                total += 1
+                if file_values.get(key) == expected:
+                    matched += 1
+                else:
+                    mismatched[key[2]] = mismatched.get(key[2], 0) + 1
+            # Items the reference did not find count against agreement too
+            total += len(set(file_values) - set(ref_file))
+        agreement = matched / total if total else 1.0
+        detail = ', '.join(f"{field} x{count}" for field, count in sorted(mismatched.items())) or '-'
+        print(f"{name:<10} {pages:>6} {seconds:>8.2f} {pages / seconds:>8.1f} {agreement:>9.1%}  {detail}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,78 @@
+"""Benchmark label rendering with and without reusable template forms.
+
+Renders the same synthetic manufacturing labels and gift notes with the
+static layer drawn on every page (before) and stored once per document as
+a form (after), and reports bytes/page and pages/second for each.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_label_forms [--labels 500] [--repeat 3]
+"""
+import argparse
+import time
+
+from towel_core import render_gift_notes, render_manufacturing_labels
+
+PRODUCTS = [
+    ('6-pc Set', ['First Washcloth', 'Second Washcloth', 'First Hand Towel',
+                  'Second Hand Towel', 'First Bath Towel', 'Second Bath Towel']),
+    ('3-pc Set', ['Washcloth', 'Hand Towel', 'Bath Towel']),
+    ('2-pc Hand Towel', ['First Hand Towel', 'Second Hand Towel']),
+    ('Bath Sheet', ['Oversized Bath Sheet']),
+]
+COLORS = ['White', 'Navy', 'Grey', 'Beige', 'Lilac']
+
+def make_labels(count):
+    """label_data-shaped dicts covering single/multi-item orders, gifts and quantities above 1"""
+    labels = []
+    for n in range(count):
+        product_type, fields = PRODUCTS[n % len(PRODUCTS)]
+        labels.append({
+            'order_id': f'113-{n:07d}-7654321',
+            'buyer': f'Buyer Number {n}',
+            'date': 'Apr 16, 2025',
+            'shipping': 'Standard',
+            'quantity': n % 4 + 1,
+            'product_type': product_type,
+            'towel_color': COLORS[n % len(COLORS)],
+            'thread_color': COLORS[(n + 2) % len(COLORS)],
+            'font': 'Lobster',
+            'customizations': [(field, f'Name{n}') for field in fields],
+            'has_gift_note': n % 3 == 0,
+            'gift_message': 'Enjoy!' if n % 3 == 0 else '',
+            'item_number': n % 2 + 1,
+            'item_count': 2 if n % 5 == 0 else 1,
+        })
+    return labels
+
+def make_notes(count):
+    return [(f'113-{n:07d}-7654321', f'Buyer Number {n}',
+             f'Happy birthday! Wishing you a wonderful year ahead, with love from all of us ({n}).')
+            for n in range(count)]
+
+def measure(render, items, repeat, **kwargs):
+    """(bytes per page, pages per second) for the best of repeat runs"""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        pdf = render(items, **kwargs)
+        best = min(best, time.perf_counter() - start)
+    return len(pdf) / len(items), len(items) / best
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--labels', type=int, default=500, help="Pages per document")
+    parser.add_argument('--repeat', type=int, default=3)
+    args = parser.parse_args()
+    
+    documents = [
+        ('manufacturing labels', render_manufacturing_labels, make_labels(args.labels)),
+        ('gift notes', render_gift_notes, make_notes(args.labels)),
+    ]
+    print(f"{'document':<22} {'mode':<8} {'bytes/page':>10} {'pages/s':>8}")
+    for name, render, items in documents:
+        for mode, use_forms in (('inline', False), ('forms', True)):
+            bytes_per_page, pages_per_second = measure(render, items, args.repeat, use_forms=use_forms)
+            print(f"{name:<22} {mode:<8} {bytes_per_page:>10.0f} {pages_per_second:>8.0f}")
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,169 @@
+"""Micro-benchmark the line-item extractor against the previous regex parser.
+
+Builds packing-slip page text with 1, 5 and 20 items, checks that both
+parsers return the same orders and reports the time per page.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_line_items [--repeat 200]
+"""
+import argparse
+import re
+import timeit
+
+from towel_core import stitch_orders
+
+ITEM_TEMPLATES = [
+    ('Towel-Set-6Pcs-White', ['First Washcloth', 'Second Washcloth', 'First Hand Towel',
+                              'Second Hand Towel', 'First Bath Towel', 'Second Bath Towel']),
+    ('Towel-Set-3Pcs-Navy', ['Washcloth', 'Hand Towel', 'Bath Towel']),
+    ('Towel-HT-2Pcs-Grey', ['First Hand Towel', 'Second Hand Towel']),
+    ('Towel-BT-2Pcs-Lilac', ['First Bath Towel', 'Second Bath Towel']),
+    ('Towel-BS-1Pcs-Beige', ['Oversized Bath Sheet']),
+]
+
+def make_page(item_count):
+    """Text of one packing-slip page with item_count line items"""
+    lines = [
+        'Ship To:', 'Jane Smith', '123 Main St', 'Springfield, IL 62701',
+        'Order ID: 113-1234567-7654321',
+        'Order Date: Apr 16, 2025',
+        'Shipping Service: Standard',
+        'Buyer Name: Jane Smith',
+        'Quantity Product Details Unit price Order Totals',
+    ]
+    for n in range(item_count):
+        sku, fields = ITEM_TEMPLATES[n % len(ITEM_TEMPLATES)]
+        lines += [
+            f'{n % 3 + 1} Personalized Towel Set $49.99 Item subtotal $49.99',
+            f'SKU: {sku}',
+            'ASIN: B0ABCDEFGH',
+            'Customizations:',
+            'Choose Your Font: Lobster',
+            'Font Color: Navy Blue (#000080)',
+        ]
+        lines += [f'{field}: Name{n}' for field in fields]
+        if n % 4 == 0:
+            lines.append(f'Gift Message: Happy Birthday {n}')
+    lines.append('Grand total: $99.98')
+    return '\n'.join(lines)
+
+def legacy_parse_page(text):
+    """The per-field re.search parser this benchmark compares against"""
+    order_id_match = re.search(r'Order ID:\s*([\d-]+)', text)
+    order = {
+        'order_id': order_id_match.group(1).strip() if order_id_match else '',
+        'order_date': '',
+        'buyer_name': '',
+        'shipping_service': '',
+        'items': []
+    }
+    date_match = re.search(r'Order Date:\s*(.+?)(?:\n|Shipping)', text)
+    if date_match:
+        order['order_date'] = date_match.group(1).strip()
+    shipping_match = re.search(r'Shipping Service:\s*(.+?)(?:\n|Buyer)', text)
+    if shipping_match:
+        order['shipping_service'] = shipping_match.group(1).strip()
+    ship_to_match = re.search(r'Ship To:\s*\n\s*(.+?)(?:\n)', text)
+    if ship_to_match:
+        order['buyer_name'] = ship_to_match.group(1).strip()
+    
+    sections = re.split(r'(SKU:\s*[^\n]+)', text)
+    for i in range(1, len(sections), 2):
+        sku_line = sections[i]
+        content = sections[i + 1]
+        sku = re.search(r'SKU:\s*([^\n]+)', sku_line).group(1).strip()
+        qty_match = re.search(r'Quantity[^\d]*(\d+)', text[:text.find(sku_line)])
+        quantity = qty_match.group(1) if qty_match else '1'
+        font_match = re.search(r'Choose Your Font:\s*(.+?)(?:\n|Font Color)', content)
+        font = font_match.group(1).strip() if font_match else ''
+        color_match = re.search(r'Font Color:\s*([^(#\n]+)', content)
+        font_color = color_match.group(1).strip() if color_match else ''
+        towel_color = sku.split('-')[-1].strip()
+        towel_color = re.split(r'\s+(?:Tax|Item|total|\$)', towel_color)[0].strip()
+        
+        fields = None
+        if 'Set-6Pcs' in sku:
+            product_type = '6-pc Set'
+            fields = [
+                ('Washcloth 1', r'First Washcloth:\s*(.+?)(?:\n|Second)'),
+                ('Washcloth 2', r'Second Washcloth:\s*(.+?)(?:\n|First Hand)'),
+                ('Hand Towel 1', r'First Hand Towel:\s*(.+?)(?:\n|Second Hand)'),
+                ('Hand Towel 2', r'Second Hand Towel:\s*(.+?)(?:\n|First Bath)'),
+                ('Bath Towel 1', r'First Bath Towel:\s*(.+?)(?:\n|Second Bath)'),
+                ('Bath Towel 2', r'Second Bath Towel:\s*(.+?)(?:\n|Item|Grand|$)')
+            ]
+        elif 'Set-3Pcs' in sku:
+            product_type = '3-pc Set'
+            fields = [
+                ('Washcloth', r'Washcloth:\s*(.+?)(?:\n|Hand Towel)'),
+                ('Hand Towel', r'Hand Towel:\s*(.+?)(?:\n|Bath Towel)'),
+                ('Bath Towel', r'Bath Towel:\s*(.+?)(?:\n|Item|Grand|Gift|Add|$)')
+            ]
+        elif 'HT-2' in sku:
+            product_type = '2-pc Hand Towel'
+            fields = [
+                ('Hand Towel 1', r'First Hand Towel:\s*(.+?)(?:\n|Second)'),
+                ('Hand Towel 2', r'Second Hand Towel:\s*(.+?)(?:\n|Item|Grand|$)')
+            ]
+        elif 'BT-2' in sku:
+            product_type = '2-pc Bath Towel'
+            fields = [
+                ('Bath Towel 1', r'First Bath Towel:\s*(.+?)(?:\n|Second)'),
+                ('Bath Towel 2', r'Second Bath Towel:\s*(.+?)(?:\n|Item|Grand|$)')
+            ]
+        elif 'BS-1' in sku:
+            product_type = 'Bath Sheet (Oversized)'
+            fields = [('Bath Sheet', r'Oversized Bath Sheet:\s*(.+?)(?:\n|Item|Grand|$)')]
+        else:
+            product_type = 'Unknown'
+        
+        customizations = []
+        for label, pattern in fields or []:
+            match = re.search(pattern, content)
+            if match:
+                customizations.append((label, match.group(1).strip()))
+        
+        gift_msg_match = re.search(r'Gift Message:\s*(.+?)(?:\n|Item|Grand|$)', content)
+        gift_message = gift_msg_match.group(1).strip() if gift_msg_match else ''
+        gift_card_match = re.search(r'Add Gift Card:\s*(.+?)(?:\n|Item|Grand|$)', content)
+        if gift_card_match and not gift_message:
+            gift_message = gift_card_match.group(1).strip()
+        
+        order['items'].append({
+            'sku': sku,
+            'product_type': product_type,
+            'towel_color': towel_color,
+            'quantity': quantity,
+            'font': font,
+            'font_color': font_color,
+            'customizations': customizations,
+            'gift_message': gift_message
+        })
+    return [order]
+
+def as_dicts(orders):
+    """Orders in the legacy parser's dict form, for comparison"""
+    return [
+        {**order.as_dict(),
+         'items': [{**item.as_dict(), 'quantity': str(item.quantity), 'customizations': list(item.customizations)}
+                   for item in order.items]}
+        for order in orders
+    ]
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--repeat', type=int, default=200, help="Parses per measurement")
+    args = parser.parse_args()
+    
+    print(f"{'items/page':>10} {'legacy us':>10} {'extractor us':>13} {'speedup':>8}  same output")
+    for item_count in (1, 5, 20):
+        page = make_page(item_count)
+        same = as_dicts(stitch_orders([page])) == legacy_parse_page(page)
+        legacy = min(timeit.repeat(lambda: legacy_parse_page(page), number=args.repeat, repeat=5))
+        extractor = min(timeit.repeat(lambda: stitch_orders([page]), number=args.repeat, repeat=5))
+        legacy_us = legacy / args.repeat * 1e6
+        extractor_us = extractor / args.repeat * 1e6
+        print(f"{item_count:>10} {legacy_us:>10.1f} {extractor_us:>13.1f} {legacy_us / extractor_us:>7.2f}x  {same}")
+
+if __name__ == '__main__':
+    main()
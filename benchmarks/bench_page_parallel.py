@@ -0,0 +1,37 @@
+"""Benchmark page-parallel extraction against the serial parser.
+
+Usage (from the repository root):
+    python -m benchmarks.bench_page_parallel slips.pdf [--workers 8]
+"""
+import argparse
+import time
+from io import BytesIO
+
+from towel_core import DEFAULT_PARSE_WORKERS, count_pages, parse_pdf_bytes, parse_pdf_bytes_paged
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('pdfs', nargs='+', help="Packing slip PDFs to parse")
+    parser.add_argument('--workers', type=int, default=DEFAULT_PARSE_WORKERS)
+    args = parser.parse_args()
+    
+    for path in args.pdfs:
+        with open(path, 'rb') as f:
+            pdf_bytes = f.read()
+        pages = count_pages(BytesIO(pdf_bytes))
+        
+        start = time.perf_counter()
+        serial = parse_pdf_bytes(pdf_bytes)
+        serial_time = time.perf_counter() - start
+        
+        start = time.perf_counter()
+        paged = parse_pdf_bytes_paged(pdf_bytes, workers=args.workers)
+        paged_time = time.perf_counter() - start
+        
+        print(f"{path}: {pages} pages, {len(serial)} orders")
+        print(f"  serial:               {serial_time:8.2f} s ({pages / serial_time:7.1f} pages/s)")
+        print(f"  page-parallel ({args.workers:>2}w): {paged_time:8.2f} s ({pages / paged_time:7.1f} pages/s)")
+        print(f"  speedup: {serial_time / paged_time:.2f}x, identical output: {paged == serial}")
+
+if __name__ == '__main__':
+    main()
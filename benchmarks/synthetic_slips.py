@@ -0,0 +1,140 @@
+"""Generate synthetic Amazon-style packing slip PDFs for benchmarks.
+
+Every SKU family the parser handles (Set-6Pcs, Set-3Pcs, HT-2, BT-2, BS-1
+and monogrammed hand towels) is drawn at random. Orders that do not fit
+on one page continue on a page without an Order ID, as real slips do.
+
+Usage (from the repository root):
+    python -m benchmarks.synthetic_slips slips.pdf --orders 1000 [--max-items 3] [--gift-rate 0.3] [--seed 1]
+"""
+import argparse
+import random
+
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfgen import canvas
+
+# (SKU prefix, personalization headings) per SKU family; the towel color is appended
+SKU_FAMILIES = {
+    'Set-6Pcs': ('Towel-Set-6Pcs', ('First Washcloth', 'Second Washcloth', 'First Hand Towel',
+                                    'Second Hand Towel', 'First Bath Towel', 'Second Bath Towel')),
+    'Set-3Pcs': ('Towel-Set-3Pcs', ('Washcloth', 'Hand Towel', 'Bath Towel')),
+    'HT-2': ('Towel-HT-2Pcs', ('First Hand Towel', 'Second Hand Towel')),
+    'BT-2': ('Towel-BT-2Pcs', ('First Bath Towel', 'Second Bath Towel')),
+    'BS-1': ('Towel-BS-1Pcs', ('Oversized Bath Sheet',)),
+    'monogrammed': ('Monogram-Towel', ()),
+}
+TOWEL_COLORS = ('White', 'Navy', 'Grey', 'Beige', 'Lilac', 'Light Pink', 'Sage')
+THREAD_COLORS = (('Navy Blue', '#000080'), ('Gold', '#FFD700'), ('Silver', '#C0C0C0'),
+                 ('Black', '#000000'), ('White', '#FFFFFF'), ('Pink', '#FFC0CB'))
+FONTS = ('Lobster', 'Great Vibes', 'Block', 'Script')
+FIRST_NAMES = ('Anna', 'Ben', 'Carla', 'Dave', 'Eve', 'Frank', 'Gina', 'Hugo', 'Iris', 'Jon')
+LAST_NAMES = ('Smith', 'Jones', 'Lee', 'Garcia', 'Brown', 'Nguyen')
+GIFT_MESSAGES = (
+    'Happy Birthday {name}!',
+    'Congratulations on your wedding, {name}! Wishing you both a lifetime of love and happiness.',
+    'Welcome to your new home, {name}. We hope these make it feel cozy from day one.',
+    'Merry Christmas {name}, with love from all of us',
+)
+
+PAGE_TOP = 740
+PAGE_BOTTOM = 60
+LINE_HEIGHT = 14
+
+class _SlipWriter:
+    """Draws text lines top to bottom, starting continuation pages as needed"""
+
+    def __init__(self, c):
+        self.c = c
+        self.y = PAGE_TOP
+
+    def new_page(self):
+        self.c.showPage()
+        self.c.setFont('Helvetica', 10)
+        self.y = PAGE_TOP
+
+    def line(self, text, x=50):
+        self.c.drawString(x, self.y, text)
+        self.y -= LINE_HEIGHT
+
+    def block(self, lines):
+        """Lines of one item, moved to a continuation page when they do not fit"""
+        if self.y - LINE_HEIGHT * len(lines) < PAGE_BOTTOM:
+            self.new_page()
+        for text in lines:
+            self.line(text)
+
+def _item_lines(rng, family, quantity, gift_rate):
+    sku_prefix, headings = SKU_FAMILIES[family]
+    color = rng.choice(TOWEL_COLORS).replace(' ', '')
+    thread, thread_hex = rng.choice(THREAD_COLORS)
+    if family == 'monogrammed':
+        sku = f"{sku_prefix}-{color}-{rng.choice('ABCDEFGHJKLMNPRSTW')}"
+    else:
+        sku = f"{sku_prefix}-{color}"
+    lines = [
+        f"{quantity} Personalized Towel Set $49.99 Item subtotal $49.99",
+        f"SKU: {sku}",
+        "ASIN: B0ABCDEFGH",
+        "Customizations:",
+        f"Choose Your Font: {rng.choice(FONTS)}",
+        f"Font Color: {thread} ({thread_hex})",
+    ]
+    lines += [f"{heading}: {rng.choice(FIRST_NAMES)}" for heading in headings]
+    if rng.random() < gift_rate:
+        lines.append("Gift Message: " + rng.choice(GIFT_MESSAGES).format(name=rng.choice(FIRST_NAMES)))
+    return lines
+
+def write_packing_slips(path, orders, min_items=1, max_items=3, gift_rate=0.3, seed=1, families=tuple(SKU_FAMILIES)):
+    """Write a PDF of synthetic packing slips to path; returns its page count
+    
+    Each order has min_items..max_items line items of the given SKU
+    families, and each item carries a gift message with probability
+    gift_rate. The same seed always produces the same document.
+    """
+    rng = random.Random(seed)
+    c = canvas.Canvas(path, pagesize=letter)
+    pages = 0
+    for n in range(orders):
+        c.setFont('Helvetica', 10)
+        writer = _SlipWriter(c)
+        item_families = [rng.choice(families) for _ in range(rng.randint(min_items, max_items))]
+        buyer = f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}"
+        quantity = rng.choice((1, 1, 1, 2, 3))
+        
+        for text in ('Ship To:', buyer, f'{rng.randint(1, 999)} Main St', 'Springfield, IL 62701'):
+            writer.line(text)
+        writer.y -= 10
+        writer.line(f"Order ID: 11{rng.randint(1, 9)}-{rng.randint(1000000, 9999999)}-{n:07d}")
+        writer.line("Thank you for buying from Towels on Amazon Marketplace.")
+        writer.line(f"Order Date: Apr {rng.randint(1, 28)}, 2025")
+        writer.line("Shipping Service: " + rng.choice(('Standard', 'Expedited', 'Priority')))
+        writer.line("Buyer Name: " + buyer)
+        writer.y -= 10
+        if 'monogrammed' in item_families:
+            writer.line("Monogrammed Hand Towels")
+        writer.line("Quantity Product Details Unit price Order Totals")
+        for family in item_families:
+            writer.block(_item_lines(rng, family, quantity, gift_rate))
+        writer.block(["Grand total: $99.98"])
+        c.showPage()
+        pages = c.getPageNumber() - 1
+    c.save()
+    return pages
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('output', help="PDF file to write")
+    parser.add_argument('--orders', type=int, default=100)
+    parser.add_argument('--min-items', type=int, default=1, help="Line items per order (minimum)")
+    parser.add_argument('--max-items', type=int, default=3, help="Line items per order (maximum)")
+    parser.add_argument('--gift-rate', type=float, default=0.3, help="Share of items with a gift message")
+    parser.add_argument('--families', nargs='+', default=list(SKU_FAMILIES), choices=list(SKU_FAMILIES))
+    parser.add_argument('--seed', type=int, default=1)
+    args = parser.parse_args()
+    
+    pages = write_packing_slips(args.output, args.orders, args.min_items, args.max_items,
+                                args.gift_rate, args.seed, tuple(args.families))
+    print(f"Wrote {args.output}: {args.orders} orders on {pages} pages")
+
+if __name__ == '__main__':
+    main()
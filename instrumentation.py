@@ -0,0 +1,119 @@
+"""Per-stage timing and memory instrumentation for parse, render and export runs.
+
+A StageTimings collects wall time per named stage (extract_page,
+parse_text, parse_file, build_table, render_label, render_gift_note,
+export_csv, export_xlsx, ...) plus the resident set size at the end of
+each timed block. Runs can be appended to a JSON lines log to track trends
+across days.
+
+The RSS figures are measured per run: in the long-running app, the
+process's peak RSS only ever grows, so it is recorded separately as the
+peak since the process started.
+"""
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager
+from datetime import datetime
+
+try:
+    import resource
+except ImportError:  # Windows
+    resource = None
+
+RUN_LOG_PATH = os.environ.get('TOWEL_RUN_LOG', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'towel_runs.jsonl'))
+
+def current_rss_mb():
+    """Resident set size of this process right now in MiB, or None where it cannot be read (non-Linux)"""
+    try:
+        with open('/proc/self/statm', encoding='ascii') as f:
+            resident_pages = int(f.read().split()[1])
+    except (OSError, ValueError, IndexError):
+        return None
+    return resident_pages * os.sysconf('SC_PAGE_SIZE') / (1024 * 1024)
+
+def peak_rss_mb():
+    """Peak resident set size of this process since it started in MiB, or None where it cannot be read"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on macOS and KiB elsewhere
+    return peak / (1024 * 1024) if sys.platform == 'darwin' else peak / 1024
+
+def _round(mb):
+    return None if mb is None else round(mb, 1)
+
+class StageTimings:
+    """Wall time per pipeline stage: calls, total and slowest call
+
+    Plain dicts only, so worker processes can return their timings to be
+    merged into the parent's.
+    """
+
+    def __init__(self):
+        self.stages = {}
+        self.rss = {}  # stage -> highest RSS at the end of one of its blocks
+
+    def add(self, name, seconds, calls=1):
+        """Record calls of a stage that took seconds in total"""
+        stage = self.stages.setdefault(name, {'calls': 0, 'seconds': 0.0, 'max_seconds': 0.0})
+        stage['calls'] += calls
+        stage['seconds'] += seconds
+        stage['max_seconds'] = max(stage['max_seconds'], seconds / calls if calls else 0.0)
+
+    @contextmanager
+    def stage(self, name, calls=1):
+        """Time the enclosed block as calls of a stage, noting the RSS afterwards"""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add(name, time.perf_counter() - start, calls)
+            rss = current_rss_mb()
+            if rss is not None:
+                self.rss[name] = max(self.rss.get(name, 0.0), rss)
+
+    def total(self, name):
+        return self.stages.get(name, {}).get('seconds', 0.0)
+
+    def merge(self, other):
+        """Fold another StageTimings (e.g. from a worker process) into this one"""
+        for name, stage in other.stages.items():
+            mine = self.stages.setdefault(name, {'calls': 0, 'seconds': 0.0, 'max_seconds': 0.0})
+            mine['calls'] += stage['calls']
+            mine['seconds'] += stage['seconds']
+            mine['max_seconds'] = max(mine['max_seconds'], stage['max_seconds'])
+        for name, rss in other.rss.items():
+            self.rss[name] = max(self.rss.get(name, 0.0), rss)
+
+    def rows(self):
+        """One summary dict per stage, in the order stages were first recorded"""
+        return [
+            {
+                'stage': name,
+                'calls': stage['calls'],
+                'total_s': round(stage['seconds'], 4),
+                'mean_ms': round(1000 * stage['seconds'] / stage['calls'], 3) if stage['calls'] else 0.0,
+                'max_ms': round(1000 * stage['max_seconds'], 3),
+                'rss_mb': _round(self.rss.get(name)),
+            }
+            for name, stage in self.stages.items()
+        ]
+
+    def write_jsonl(self, path=RUN_LOG_PATH, **run_info):
+        """Append this run as one JSON line: time, run_info fields, RSS figures and stages
+
+        rss_mb is the highest RSS at the end of a stage of this run;
+        process_peak_rss_mb is the process's peak since it started.
+        """
+        record = {
+            'time': datetime.now().isoformat(timespec='seconds'),
+            **run_info,
+            'rss_mb': _round(max(self.rss.values(), default=None)),
+            'process_peak_rss_mb': _round(peak_rss_mb()),
+            'stages': self.rows(),
+        }
+        with open(path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(record) + '\n')
+        return record
@@ -0,0 +1,180 @@
+"""Process-wide queue of background jobs shared by all Streamlit sessions.
+
+Parsing uploads and rendering large label PDFs run as jobs on a fixed
+number of worker threads instead of in the session's script thread, so a
+script run only submits work and then polls the job's status and progress.
+The heavy lifting inside a job still fans out to worker processes.
+
+Jobs are identified by a key describing their input (e.g. the content
+hashes of the uploads to parse). Submitting a key that is already queued,
+running or recently finished returns that job, so identical work started
+from several sessions runs once. A job is cancelled only when every
+session watching it has cancelled; cancellation is cooperative and takes
+effect at the job's next progress report.
+"""
+import hashlib
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+DEFAULT_JOB_WORKERS = 2
+DEFAULT_MAX_PENDING = 16  # jobs waiting for a worker before submissions are refused
+DEFAULT_MAX_FINISHED = 32  # finished jobs kept for sessions that have not collected them yet
+
+QUEUED = 'queued'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+CANCELLED = 'cancelled'
+FINISHED_STATUSES = (DONE, FAILED, CANCELLED)
+
+class JobCancelled(BaseException):
+    """Raised inside a job at a progress report once it has been cancelled
+
+    A BaseException, so per-file error handling (which records any
+    Exception as that file's parse error) does not swallow it.
+    """
+
+class JobQueueFull(Exception):
+    """Raised by submit when max_pending jobs are already waiting"""
+
+def _job_id(key):
+    """Short stable id of a job key"""
+    return hashlib.sha256(repr(key).encode('utf-8')).hexdigest()[:16]
+
+class Job:
+    """One unit of background work: status, progress, result and its watching sessions"""
+
+    def __init__(self, key, fn, args, kwargs):
+        self.key = key
+        self.id = _job_id(key)
+        self.status = QUEUED
+        self.done = 0
+        self.total = 0
+        self.message = ''
+        self.partial = None  # set by the job to describe what is usable before it finishes
+        self.result = None
+        self.error = None
+        self.submitted = time.time()
+        self.started = self.finished_at = None
+        self.watchers = set()
+        self._fn, self._args, self._kwargs = fn, args, kwargs
+        self._cancel = threading.Event()
+
+    @property
+    def finished(self):
+        return self.status in FINISHED_STATUSES
+
+    @property
+    def cancelled(self):
+        return self._cancel.is_set()
+
+    @property
+    def fraction(self):
+        """Share of the work done, from 0.0 to 1.0"""
+        if self.status == DONE:
+            return 1.0
+        return min(self.done / self.total, 1.0) if self.total else 0.0
+
+    def report(self, done, total, message=''):
+        """Progress from inside the job; raises JobCancelled once the job was cancelled"""
+        self.done, self.total = done, total
+        if message:
+            self.message = message
+        self.check_cancelled()
+
+    def check_cancelled(self):
+        if self._cancel.is_set():
+            raise JobCancelled()
+
+    def _run(self):
+        if self._cancel.is_set():
+            self.status, self.finished_at = CANCELLED, time.time()
+            return
+        self.status, self.started = RUNNING, time.time()
+        try:
+            self.result = self._fn(self, *self._args, **self._kwargs)
+        except JobCancelled:
+            self.status = CANCELLED
+        except Exception as e:
+            self.error = str(e)
+            self.status = FAILED
+        else:
+            self.status = DONE
+        finally:
+            self.finished_at = time.time()
+            self._fn = self._args = self._kwargs = None
+
+class JobQueue:
+    """Bounded pool of worker threads running Jobs, deduplicated by key
+
+    Safe to share between Streamlit sessions (create it with
+    st.cache_resource). Sessions refer to jobs by id and poll them.
+    """
+
+    def __init__(self, workers=DEFAULT_JOB_WORKERS, max_pending=DEFAULT_MAX_PENDING, max_finished=DEFAULT_MAX_FINISHED):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.max_finished = max_finished
+        self._executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='towel-job')
+        self._jobs = OrderedDict()  # id -> Job, least recently submitted first
+        self._lock = threading.Lock()
+
+    def submit(self, key, fn, *args, watcher=None, reusable=None, **kwargs):
+        """Job for key, starting fn(job, *args, **kwargs) unless one is queued, running or done
+
+        Failed and cancelled jobs are started again, and so are done jobs for
+        which reusable(job), if given, is false (e.g. their output file is
+        gone). watcher (e.g. a session id) is added to the job's watchers.
+        """
+        with self._lock:
+            job = self._jobs.get(_job_id(key))
+            if (job is None or job.status in (FAILED, CANCELLED) or job.cancelled
+                    or (job.status == DONE and reusable is not None and not reusable(job))):
+                if self._pending() >= self.max_pending:
+                    raise JobQueueFull(f"{self.max_pending} jobs are already waiting")
+                job = Job(key, fn, args, kwargs)
+                self._jobs[job.id] = job
+                self._executor.submit(job._run)
+            self._jobs.move_to_end(job.id)
+            if watcher is not None:
+                job.watchers.add(watcher)
+            self._evict()
+            return job
+
+    def get(self, job_id):
+        """Job by id, or None once it was evicted"""
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def find(self, key):
+        """Job for key without submitting anything, or None"""
+        return self.get(_job_id(key))
+
+    def cancel(self, job_id, watcher=None):
+        """Stop watching a job; it is cancelled when no watcher is left"""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None or job.finished:
+                return
+            job.watchers.discard(watcher)
+            if not job.watchers:
+                job._cancel.set()
+
+    def status(self):
+        """Number of jobs per status"""
+        with self._lock:
+            counts = {}
+            for job in self._jobs.values():
+                counts[job.status] = counts.get(job.status, 0) + 1
+            return counts
+
+    def _pending(self):
+        return sum(1 for job in self._jobs.values() if job.status == QUEUED)
+
+    def _evict(self):
+        """Drop the oldest finished jobs beyond max_finished"""
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
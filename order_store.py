@@ -0,0 +1,135 @@
+"""Persistent local store of parsed line items.
+
+Every parsed item is upserted into a SQLite table keyed by (Order ID, item
+position), together with the time its manufacturing label and gift note
+were last printed. Re-uploaded orders are recognized by that key, so only
+new items need labels.
+"""
+import json
+import os
+import sqlite3
+from contextlib import contextmanager
+from datetime import datetime
+
+DEFAULT_DB_PATH = os.environ.get('TOWEL_ORDER_DB', os.path.join(os.path.dirname(os.path.abspath(__file__)), 'towel_orders.db'))
+
+# Print kinds tracked per item -> timestamp column
+PRINT_COLUMNS = {
+    'label': 'label_printed_at',
+    'gift_note': 'gift_note_printed_at',
+}
+
+SQLITE_MAX_PARAMS = 500  # keys per IN (...) query, well under SQLite's limit
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS items (
+    order_id TEXT NOT NULL,
+    item_position INTEGER NOT NULL,
+    order_date TEXT,
+    buyer_name TEXT,
+    shipping_service TEXT,
+    sku TEXT,
+    product_type TEXT,
+    towel_color TEXT,
+    quantity INTEGER,
+    font TEXT,
+    font_color TEXT,
+    customizations TEXT,
+    gift_message TEXT,
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL,
+    label_printed_at TEXT,
+    gift_note_printed_at TEXT,
+    PRIMARY KEY (order_id, item_position)
+)
+"""
+
+_UPSERT = """
+INSERT INTO items (order_id, item_position, order_date, buyer_name, shipping_service,
+                   sku, product_type, towel_color, quantity, font, font_color,
+                   customizations, gift_message, first_seen, last_seen)
+VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+ON CONFLICT (order_id, item_position) DO UPDATE SET
+    order_date = excluded.order_date,
+    buyer_name = excluded.buyer_name,
+    shipping_service = excluded.shipping_service,
+    sku = excluded.sku,
+    product_type = excluded.product_type,
+    towel_color = excluded.towel_color,
+    quantity = excluded.quantity,
+    font = excluded.font,
+    font_color = excluded.font_color,
+    customizations = excluded.customizations,
+    gift_message = excluded.gift_message,
+    last_seen = excluded.last_seen
+"""
+
+def _now():
+    return datetime.now().isoformat(timespec='seconds')
+
+def _chunks(values, size=SQLITE_MAX_PARAMS):
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
+class OrderStore:
+    """SQLite-backed store of line items keyed by (order_id, item_position)
+
+    A connection is opened per call, so one store can be shared by all
+    Streamlit sessions (each runs in its own thread).
+    """
+
+    def __init__(self, path=DEFAULT_DB_PATH):
+        self.path = path
+        with self._connect() as conn:
+            conn.execute(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        """Connection committed on success and always closed"""
+        conn = sqlite3.connect(self.path, timeout=30)
+        try:
+            conn.execute('PRAGMA journal_mode=WAL')
+            with conn:
+                yield conn
+        finally:
+            conn.close()
+
+    def upsert_items(self, order_items):
+        """Insert or refresh (order, item, item_position) tuples; print times are kept"""
+        now = _now()
+        rows = [
+            (order.order_id, position, order.order_date, order.buyer_name,
+             order.shipping_service, item.sku, item.product_type, item.towel_color,
+             item.quantity, item.font, item.font_color,
+             json.dumps(item.customizations), item.gift_message, now, now)
+            for order, item, position in order_items
+        ]
+        with self._connect() as conn:
+            conn.executemany(_UPSERT, rows)
+        return len(rows)
+
+    def print_status(self, order_ids):
+        """{(order_id, item_position): {'label': time or None, 'gift_note': time or None}}"""
+        status = {}
+        order_ids = sorted(set(order_ids))
+        with self._connect() as conn:
+            for chunk in _chunks(order_ids):
+                placeholders = ', '.join('?' * len(chunk))
+                cursor = conn.execute(
+                    f"SELECT order_id, item_position, label_printed_at, gift_note_printed_at "
+                    f"FROM items WHERE order_id IN ({placeholders})",
+                    chunk
+                )
+                for order_id, position, label_at, gift_note_at in cursor:
+                    status[(order_id, position)] = {'label': label_at, 'gift_note': gift_note_at}
+        return status
+
+    def mark_printed(self, keys, kind='label'):
+        """Record that (order_id, item_position) keys were printed just now"""
+        column = PRINT_COLUMNS[kind]
+        now = _now()
+        with self._connect() as conn:
+            conn.executemany(
+                f"UPDATE items SET {column} = ? WHERE order_id = ? AND item_position = ?",
+                [(now, order_id, position) for order_id, position in keys]
+            )
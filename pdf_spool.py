@@ -0,0 +1,106 @@
+"""Bounded on-disk spool of generated PDFs.
+
+Label and gift note PDFs generated in the app are written to files in a
+spool directory, and browser sessions keep only their session reference.
+Downloads are read back from the file. A session has at most one file per
+artifact name (a new one replaces the old), files expire after max_age
+seconds, and the oldest files are removed once the spool grows beyond
+max_bytes.
+"""
+import os
+import re
+import tempfile
+import threading
+import time
+import uuid
+
+DEFAULT_SPOOL_DIR = os.environ.get('TOWEL_SPOOL_DIR', os.path.join(tempfile.gettempdir(), 'towel_spool'))
+SPOOL_MAX_BYTES = 1024 * 1024 * 1024
+SPOOL_MAX_AGE = 6 * 60 * 60  # seconds
+
+_NAME_RE = re.compile(r'^[A-Za-z0-9_-]+$')
+
+def new_session_id():
+    """Random reference for one browser session's spooled files"""
+    return uuid.uuid4().hex
+
+class PdfSpool:
+    """Directory of generated PDFs keyed by (session id, artifact name)
+
+    Bounded by total size and file age. Safe to share between Streamlit
+    sessions: a file removed while being looked up simply counts as missing.
+    """
+
+    def __init__(self, directory=DEFAULT_SPOOL_DIR, max_bytes=SPOOL_MAX_BYTES, max_age=SPOOL_MAX_AGE):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.max_age = max_age
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, session_id, name):
+        if not (_NAME_RE.match(session_id) and _NAME_RE.match(name)):
+            raise ValueError(f"Invalid spool reference: {session_id!r}, {name!r}")
+        return os.path.join(self.directory, f'{session_id}.{name}.pdf')
+
+    def write(self, session_id, name, data):
+        """Store data as the session's artifact name, replacing any earlier one; returns its path"""
+        path = self._path(session_id, name)
+        temp_path = f'{path}.{uuid.uuid4().hex}.tmp'
+        with open(temp_path, 'wb') as f:
+            f.write(data)
+        os.replace(temp_path, path)
+        self.sweep(keep=path)
+        return path
+
+    def path(self, session_id, name):
+        """Path of the session's artifact, or None if it was never written, expired or evicted"""
+        path = self._path(session_id, name)
+        try:
+            modified = os.path.getmtime(path)
+        except OSError:
+            return None
+        return path if time.time() - modified <= self.max_age else None
+
+    def remove(self, session_id, name):
+        try:
+            os.remove(self._path(session_id, name))
+        except FileNotFoundError:
+            pass
+
+    def _files(self):
+        """(modified time, size, path) of every spooled PDF, oldest first"""
+        files = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.pdf'):
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                files.append((stat.st_mtime, stat.st_size, entry.path))
+        return sorted(files)
+
+    def sweep(self, keep=None):
+        """Remove expired files, then the oldest ones until the spool fits in max_bytes"""
+        with self._lock:
+            now = time.time()
+            files = []
+            for modified, size, path in self._files():
+                if now - modified > self.max_age and path != keep:
+                    self._discard(path)
+                else:
+                    files.append((modified, size, path))
+            total = sum(size for _, size, _ in files)
+            for _, size, path in files:
+                if total <= self.max_bytes:
+                    break
+                if path != keep:
+                    self._discard(path)
+                    total -= size
+
+    @staticmethod
+    def _discard(path):
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
@@ -0,0 +1,65 @@
+"""Deduplication, cancellation and restarts of the shared job queue."""
+import threading
+import time
+
+import pytest
+
+from job_queue import CANCELLED, DONE, JobQueue
+
+TIMEOUT = 10
+
+@pytest.fixture
+def queue():
+    return JobQueue(workers=1)
+
+def blocking_job(calls, release):
+    """Job function that counts its runs and reports progress until released"""
+
+    def run(job):
+        calls.append(job.id)
+        while not release.wait(0.01):
+            job.report(0, 1)
+        return len(calls)
+
+    return run
+
+def wait_finished(job):
+    for _ in range(TIMEOUT * 100):
+        if job.finished:
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job still {job.status}")
+
+def test_same_key_runs_once(queue):
+    calls, release = [], threading.Event()
+    first = queue.submit('key', blocking_job(calls, release), watcher='a')
+    second = queue.submit('key', blocking_job(calls, release), watcher='b')
+    assert second is first
+    assert first.watchers == {'a', 'b'}
+    release.set()
+    assert wait_finished(first).status == DONE
+    assert queue.submit('key', blocking_job(calls, release)) is first
+    assert len(calls) == 1
+
+def test_cancelled_only_when_every_watcher_cancels(queue):
+    calls, release = [], threading.Event()
+    job = queue.submit('key', blocking_job(calls, release), watcher='a')
+    queue.submit('key', blocking_job(calls, release), watcher='b')
+    queue.cancel(job.id, 'a')
+    assert not job.cancelled
+    queue.cancel(job.id, 'b')
+    assert wait_finished(job).status == CANCELLED
+
+    restarted = queue.submit('key', blocking_job(calls, release), watcher='a')
+    assert restarted is not job and restarted.id == job.id
+    release.set()
+    assert wait_finished(restarted).status == DONE
+
+def test_done_job_restarted_when_not_reusable(queue):
+    calls, release = [], threading.Event()
+    release.set()
+    job = wait_finished(queue.submit('key', blocking_job(calls, release)))
+    assert queue.submit('key', blocking_job(calls, release), reusable=lambda job: True) is job
+    again = queue.submit('key', blocking_job(calls, release), reusable=lambda job: False)
+    assert again is not job
+    assert wait_finished(again).result == 2
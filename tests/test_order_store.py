@@ -0,0 +1,35 @@
+"""Re-uploaded and overlapping slip files against the order store."""
+from benchmarks.synthetic_slips import write_packing_slips
+from order_store import OrderStore
+from towel_core import iter_order_items, parse_towel_orders, unique_orders
+
+def parse_uploads(paths):
+    """Orders of several uploads merged as the app merges them"""
+    orders = []
+    for path in paths:
+        orders.extend(parse_towel_orders(str(path)))
+    return unique_orders(orders)
+
+def store_and_count_unprinted(store, orders):
+    """Upsert orders' items; returns the number of items without a printed label"""
+    keys = [(order.order_id, number) for order, _, number, _ in iter_order_items(orders)]
+    store.upsert_items((order, item, number) for order, item, number, _ in iter_order_items(orders))
+    status = store.print_status(key[0] for key in keys)
+    return sum(1 for key in keys if not status[key]['label'])
+
+def test_overlapping_reupload_adds_no_unprinted_items(tmp_path):
+    # Same seed: day 2's slips start with all of day 1's orders
+    day1, day2 = tmp_path / 'day1.pdf', tmp_path / 'day2.pdf'
+    write_packing_slips(str(day1), 10, seed=7)
+    write_packing_slips(str(day2), 15, seed=7)
+    store = OrderStore(str(tmp_path / 'orders.db'))
+
+    orders = parse_uploads([day1])
+    store_and_count_unprinted(store, orders)
+    store.mark_printed((order.order_id, number) for order, _, number, _ in iter_order_items(orders))
+
+    both = parse_uploads([day1, day2])
+    day2_only = parse_uploads([day2])[len(orders):]
+    assert len(both) == 15
+    assert store_and_count_unprinted(store, both) == sum(len(order.items) for order in day2_only)
+    assert store_and_count_unprinted(store, parse_uploads([day1, day1])) == 0
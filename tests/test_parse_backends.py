@@ -0,0 +1,38 @@
+"""Every extraction backend and the page-parallel parser against pdfplumber on synthetic slips."""
+import pytest
+
+import towel_core
+from benchmarks.synthetic_slips import write_packing_slips
+from towel_core import (
+    EXTRACTION_BACKENDS,
+    PRODUCT_RULES,
+    UNKNOWN_PRODUCT,
+    parse_pdf_bytes,
+    parse_pdf_bytes_paged,
+)
+
+@pytest.fixture(scope='module')
+def slips(tmp_path_factory):
+    """Raw bytes of a slip PDF with every SKU family, gift messages and continuation pages"""
+    path = tmp_path_factory.mktemp('slips') / 'slips.pdf'
+    write_packing_slips(str(path), 24, max_items=6, gift_rate=0.5, seed=3)
+    return path.read_bytes()
+
+@pytest.fixture(scope='module')
+def reference(slips):
+    return parse_pdf_bytes(slips, backend='layout')
+
+def test_reference_covers_every_product_rule(reference):
+    # Monogrammed items pushed to a continuation page lose their page heading and stay Unknown
+    product_types = {item.product_type for order in reference for item in order.items} - {UNKNOWN_PRODUCT}
+    assert len(reference) == 24
+    assert product_types == {rule['product_type'] for rule in PRODUCT_RULES}
+
+@pytest.mark.parametrize('backend', sorted(set(EXTRACTION_BACKENDS) - {'layout'}))
+def test_backend_matches_pdfplumber(slips, reference, backend):
+    assert parse_pdf_bytes(slips, backend=backend) == reference
+
+def test_paged_parse_matches_serial(slips, reference, monkeypatch):
+    # Split even this small document into page ranges
+    monkeypatch.setattr(towel_core, 'PAGE_PARALLEL_MIN_PAGES', 2)
+    assert parse_pdf_bytes_paged(slips, workers=2) == reference
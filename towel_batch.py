@@ -0,0 +1,147 @@
+"""Headless batch processing of Amazon towel packing slips.
+
+Parses every PDF in a directory and writes, in one pass:
+    manufacturing_labels.pdf, gift_notes.pdf, towel_orders.csv, towel_orders.xlsx
+
+Usage:
+    python towel_batch.py slips/ -o output/ [--workers 8] [--backend layout] [--plan-sheets] [--sequence] [--run-log runs.jsonl]
+
+Suitable for cron: Streamlit is never imported, and the exit status is 1
+when any file fails to parse.
+"""
+import argparse
+import os
+import sys
+import time
+from contextlib import nullcontext
+
+from instrumentation import StageTimings
+from towel_core import (
+    DEFAULT_BACKEND,
+    DEFAULT_PARSE_WORKERS,
+    EXTRACTION_BACKENDS,
+    changeovers,
+    export_csv,
+    export_xlsx,
+    gift_note_data,
+    label_records,
+    manufacturing_plan,
+    orders_to_dataframe,
+    parse_pdf_batch,
+    production_sequence,
+    render_gift_notes,
+    render_manufacturing_labels,
+    render_sharded,
+    unique_orders,
+)
+
+def find_pdfs(input_dir):
+    """PDF files directly inside input_dir, sorted by name"""
+    return sorted(
+        os.path.join(input_dir, name)
+        for name in os.listdir(input_dir)
+        if name.lower().endswith('.pdf') and os.path.isfile(os.path.join(input_dir, name))
+    )
+
+def write_file(path, data):
+    with open(path, 'wb') as f:
+        f.write(data)
+    print(f"Wrote {path}")
+
+def _stage(timings, name):
+    return timings.stage(name) if timings is not None else nullcontext()
+
+def run_batch(input_dir, output_dir, workers=DEFAULT_PARSE_WORKERS, backend=DEFAULT_BACKEND, plan_sheets=False,
+              timings=None, sequence=False):
+    """Parse input_dir and write all outputs; returns the number of failed files
+    
+    timings, if given, is a StageTimings that receives the time of every stage.
+    With sequence, manufacturing labels are printed in production sequence.
+    """
+    paths = find_pdfs(input_dir)
+    if not paths:
+        print(f"No PDF files found in {input_dir}")
+        return 0
+
+    start = time.perf_counter()
+    blobs = []
+    for path in paths:
+        with open(path, 'rb') as f:
+            blobs.append(f.read())
+    results = parse_pdf_batch(blobs, workers=workers, backend=backend, timings=timings)
+
+    all_orders = []
+    failures = 0
+    for path, (orders, error) in zip(paths, results):
+        if error is not None:
+            print(f"Error parsing {os.path.basename(path)}: {error}", file=sys.stderr)
+            failures += 1
+        else:
+            all_orders.extend(orders)
+    all_orders = unique_orders(all_orders)  # orders repeated in overlapping slip files
+
+    with _stage(timings, 'build_table'):
+        labels = label_records(all_orders)
+        df = orders_to_dataframe(all_orders, labels)
+    print(f"Parsed {len(all_orders)} orders with {len(labels)} items "
+          f"from {len(paths)} files in {time.perf_counter() - start:.1f}s")
+    if not labels:
+        return failures
+
+    plan = manufacturing_plan(df) if plan_sheets or sequence else None
+    label_order = labels
+    if sequence:
+        rows = df.loc[production_sequence(df, plan['thread_summary'].index)]
+        label_order = [labels[idx - 1] for idx in rows.index]
+        before, after = changeovers(df), changeovers(rows)
+        print(f"Production sequence: {after['thread']} thread and {after['blank']} blank changeovers "
+              f"(upload order: {before['thread']} and {before['blank']})")
+
+    os.makedirs(output_dir, exist_ok=True)
+    write_file(os.path.join(output_dir, 'manufacturing_labels.pdf'), render_sharded(render_manufacturing_labels, label_order, workers, timings))
+
+    notes = [gift_note_data(record) for record in labels if record['has_gift_note']]
+    if notes:
+        write_file(os.path.join(output_dir, 'gift_notes.pdf'), render_sharded(render_gift_notes, notes, workers, timings))
+    else:
+        print("No gift messages; gift_notes.pdf not written")
+
+    with _stage(timings, 'export_csv'):
+        csv_data = export_csv(df)
+    write_file(os.path.join(output_dir, 'towel_orders.csv'), csv_data)
+    with _stage(timings, 'export_xlsx'):
+        xlsx_data = export_xlsx(df, plan if plan_sheets else None)
+    write_file(os.path.join(output_dir, 'towel_orders.xlsx'), xlsx_data)
+    return failures
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Generate labels, gift notes and exports from a folder of packing slips")
+    parser.add_argument('input_dir', help="Directory containing packing slip PDFs")
+    parser.add_argument('-o', '--output-dir', default='output', help="Directory for generated files (default: output)")
+    parser.add_argument('--workers', type=int, default=DEFAULT_PARSE_WORKERS, help="Worker processes for parsing and label rendering")
+    parser.add_argument('--backend', default=DEFAULT_BACKEND, choices=sorted(EXTRACTION_BACKENDS),
+                        help="Text extraction backend")
+    parser.add_argument('--plan-sheets', action='store_true',
+                        help="Add the manufacturing plan summaries as extra sheets of towel_orders.xlsx")
+    parser.add_argument('--sequence', action='store_true',
+                        help="Print manufacturing labels in production sequence (fewest thread and blank changeovers)")
+    parser.add_argument('--run-log', metavar='PATH',
+                        help="Append per-stage timings and peak memory of this run to a JSON lines file")
+    args = parser.parse_args(argv)
+
+    timings = StageTimings() if args.run_log else None
+    failures = run_batch(args.input_dir, args.output_dir, args.workers, args.backend, args.plan_sheets, timings,
+                         args.sequence)
+    if timings is not None:
+        record = timings.write_jsonl(args.run_log, input_dir=args.input_dir, backend=args.backend,
+                                     workers=args.workers, failures=failures)
+        for row in record['stages']:
+            print(f"  {row['stage']:<20} {row['calls']:>7} calls {row['total_s']:>9.3f}s "
+                  f"(mean {row['mean_ms']:.2f} ms, max {row['max_ms']:.2f} ms)")
+        # One process per batch run, so its peak since start is this run's
+        peak = f"Peak RSS {record['process_peak_rss_mb']:.0f} MiB; " if record['process_peak_rss_mb'] is not None else ""
+        print(f"{peak}Run logged to {args.run_log}")
+    return 1 if failures else 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,1595 @@
+"""Core order parsing and label rendering for Amazon towel packing slips.
+
+This module does not import Streamlit, so it can be used from worker
+processes and scripts (see towel_batch.py) as well as from the web app.
+"""
+import hashlib
+import json
+import multiprocessing
+import os
+import re
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import partial
+from io import BytesIO
+
+import pandas as pd
+import pdfplumber
+import pypdfium2 as pdfium
+import xlsxwriter
+from pdfminer.high_level import extract_pages
+from pdfminer.layout import LAParams, LTTextContainer
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import inch, landscape
+from reportlab.lib.utils import simpleSplit
+from reportlab.pdfgen import canvas
+
+from instrumentation import StageTimings
+
+# Parallel parsing settings
+DEFAULT_PARSE_WORKERS = min(os.cpu_count() or 1, 8)
+PARALLEL_MIN_BYTES = 256 * 1024  # smaller batches are parsed in-process
+PAGE_PARALLEL_MIN_PAGES = 40  # smaller documents are not split by page range
+MIN_PAGES_PER_RANGE = 10
+PARSE_MODES = ('auto', 'files', 'pages')
+
+# Text extraction
+DEFAULT_BACKEND = 'layout'
+CHAR_LINE_TOLERANCE = 3  # points of vertical drift still treated as one line
+CHAR_SPACE_TOLERANCE = 3  # horizontal gap (points) that becomes a space
+
+# 6x4 inch landscape labels
+LABEL_PAGESIZE = landscape((4 * inch, 6 * inch))
+
+# Parallel label rendering
+PARALLEL_RENDER_MIN_PAGES = 200  # smaller documents are rendered in-process
+MIN_PAGES_PER_SHARD = 50
+# Shard size and minimum seconds between partial documents when the labels
+# finished so far are handed out while the rest render
+RENDER_CHUNK_PAGES = 100
+PARTIAL_INTERVAL = 2.0
+# Seconds between progress calls while waiting on worker processes, so a
+# progress callback can stop a long parse or render by raising
+PROGRESS_HEARTBEAT = 0.5
+
+# Document being split by page range and its backend (set in each worker)
+_worker_pdf_bytes = None
+_worker_backend = None
+# Pages drawn by all render workers of a pool, shared for progress (set in each worker)
+_worker_pages_rendered = None
+
+# ==================== ORDER MODEL ====================
+
+class _Record:
+    """Slotted record compared, printed and converted field by field"""
+    __slots__ = ()
+    
+    def __eq__(self, other):
+        if type(other) is not type(self):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+    
+    def __repr__(self):
+        fields = ', '.join(f'{name}={getattr(self, name)!r}' for name in self.__slots__)
+        return f'{type(self).__name__}({fields})'
+    
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+class LineItem(_Record):
+    """One line item of a packing slip
+    
+    quantity is an int and customizations a tuple of (label, value) pairs.
+    Values repeated across a batch (product type, towel color, font, thread
+    color) are interned, so every item shares one string per distinct value.
+    """
+    __slots__ = ('sku', 'product_type', 'towel_color', 'quantity', 'font', 'font_color', 'customizations',
+                 'gift_message')
+    
+    def __init__(self, sku, product_type, towel_color, quantity=1, font='', font_color='', customizations=(),
+                 gift_message=''):
+        self.sku = sku
+        self.product_type = sys.intern(product_type)
+        self.towel_color = sys.intern(towel_color)
+        self.quantity = quantity
+        self.font = sys.intern(font)
+        self.font_color = sys.intern(font_color)
+        self.customizations = tuple(customizations)
+        self.gift_message = gift_message
+
+class Order(_Record):
+    """One order with its line items; order date and shipping service are interned"""
+    __slots__ = ('order_id', 'order_date', 'buyer_name', 'shipping_service', 'items')
+    
+    def __init__(self, order_id, order_date='', buyer_name='', shipping_service='', items=None):
+        self.order_id = order_id
+        self.order_date = sys.intern(order_date)
+        self.buyer_name = buyer_name
+        self.shipping_service = sys.intern(shipping_service)
+        self.items = [] if items is None else items
+
+# ==================== PRODUCT RULES ====================
+# One entry per product. An item's product is the first rule whose SKU
+# marker occurs in its SKU; items whose SKU has no marker take the first rule
+# whose page marker occurs on their page. Each field is read as
+# (label, field heading, words ending the value); production_units counts
+# one unit ordered for embroidery and components are the blanks it uses.
+# Adding a product only needs an entry here.
+PRODUCT_RULES = (
+    {
+        'product_type': '6-pc Set',
+        'sku_markers': ('Set-6Pcs',),
+        'production_units': 2,  # embroidered as 2x 3-pc sets
+        'components': {'Washcloths': 2, 'Hand Towels': 2, 'Bath Towels': 2},
+        'fields': (
+            ('Washcloth 1', 'First Washcloth:', r'\n|Second'),
+            ('Washcloth 2', 'Second Washcloth:', r'\n|First Hand'),
+            ('Hand Towel 1', 'First Hand Towel:', r'\n|Second Hand'),
+            ('Hand Towel 2', 'Second Hand Towel:', r'\n|First Bath'),
+            ('Bath Towel 1', 'First Bath Towel:', r'\n|Second Bath'),
+            ('Bath Towel 2', 'Second Bath Towel:', r'\n|Item|Grand|$'),
+        ),
+    },
+    {
+        'product_type': '3-pc Set',
+        'sku_markers': ('Set-3Pcs',),
+        'production_units': 1,
+        'components': {'Washcloths': 1, 'Hand Towels': 1, 'Bath Towels': 1},
+        'fields': (
+            ('Washcloth', 'Washcloth:', r'\n|Hand Towel'),
+            ('Hand Towel', 'Hand Towel:', r'\n|Bath Towel'),
+            ('Bath Towel', 'Bath Towel:', r'\n|Item|Grand|Gift|Add|$'),
+        ),
+    },
+    {
+        'product_type': '2-pc Hand Towel',
+        'sku_markers': ('HT-2',),
+        'production_units': 1,
+        'components': {'Hand Towels': 2},
+        'fields': (
+            ('Hand Towel 1', 'First Hand Towel:', r'\n|Second'),
+            ('Hand Towel 2', 'Second Hand Towel:', r'\n|Item|Grand|$'),
+        ),
+    },
+    {
+        'product_type': '2-pc Bath Towel',
+        'sku_markers': ('BT-2',),
+        'production_units': 1,
+        'components': {'Bath Towels': 2},
+        'fields': (
+            ('Bath Towel 1', 'First Bath Towel:', r'\n|Second'),
+            ('Bath Towel 2', 'Second Bath Towel:', r'\n|Item|Grand|$'),
+        ),
+    },
+    {
+        'product_type': 'Bath Sheet (Oversized)',
+        'sku_markers': ('BS-1',),
+        'production_units': 1,
+        'components': {'Bath Sheets': 1},
+        'fields': (
+            ('Bath Sheet', 'Oversized Bath Sheet:', r'\n|Item|Grand|$'),
+        ),
+    },
+    {
+        'product_type': '2-pc Hand Towel (Monogrammed)',
+        'page_marker': 'Monogrammed Hand Towels',
+        'production_units': 1,
+        'components': {'Hand Towels': 2},
+        # No customization fields: the initial at the end of the SKU goes on both towels
+        'sku_initial': ('Hand Towel 1', 'Hand Towel 2'),
+    },
+)
+UNKNOWN_PRODUCT = 'Unknown'
+
+def _value_pattern(stop):
+    """Anchored pattern reading a field value up to a newline or stop word"""
+    return re.compile(r'\s*(.+?)(?:' + stop + ')')
+
+class _CompiledRule(_Record):
+    """A PRODUCT_RULES entry with its value patterns compiled"""
+    __slots__ = ('product_type', 'fields', 'sku_initial')
+    
+    def __init__(self, rule):
+        self.product_type = sys.intern(rule['product_type'])
+        self.fields = tuple((label, heading, _value_pattern(stop)) for label, heading, stop in rule.get('fields', ()))
+        self.sku_initial = rule.get('sku_initial', ())
+
+_UNKNOWN_RULE = _CompiledRule({'product_type': UNKNOWN_PRODUCT})
+
+def _compile_product_rules(rules):
+    """Index rules for extraction: (SKU marker regex, {marker: (rank, rule)}, page-marker rules)
+    
+    All SKU markers go into one alternation, so a SKU is scanned once
+    whatever the number of products; the rank keeps table order when a SKU
+    contains markers of several products.
+    """
+    by_marker = {}
+    page_rules = []
+    for rank, rule in enumerate(rules):
+        compiled = _CompiledRule(rule)
+        for marker in rule.get('sku_markers', ()):
+            by_marker.setdefault(marker, (rank, compiled))
+        if 'page_marker' in rule:
+            page_rules.append((rule['page_marker'], compiled))
+    # Longest first, so a marker that contains another one wins at the same position
+    markers = sorted(by_marker, key=len, reverse=True)
+    return re.compile('|'.join(re.escape(marker) for marker in markers)), by_marker, tuple(page_rules)
+
+_SKU_MARKER_RE, _SKU_MARKER_RULES, _PAGE_MARKER_RULES = _compile_product_rules(PRODUCT_RULES)
+# SKUs repeat across orders (one per product and color), so each is matched once
+_SKU_RULE_CACHE_SIZE = 4096
+_sku_rules = {}
+
+def _sku_rule(sku):
+    """Compiled rule for the first product whose SKU marker occurs in sku, or None"""
+    try:
+        return _sku_rules[sku]
+    except KeyError:
+        pass
+    found = [_SKU_MARKER_RULES[match.group()] for match in _SKU_MARKER_RE.finditer(sku)]
+    rule = min(found, key=lambda ranked: ranked[0])[1] if found else None
+    if len(_sku_rules) >= _SKU_RULE_CACHE_SIZE:
+        _sku_rules.clear()
+    _sku_rules[sku] = rule
+    return rule
+
+def _page_rule(text):
+    """Compiled rule for items without a SKU marker on this page"""
+    for marker, rule in _PAGE_MARKER_RULES:
+        if marker in text:
+            return rule
+    return _UNKNOWN_RULE
+
+# ==================== LINE-ITEM EXTRACTION ====================
+
+# Order header fields
+_ORDER_ID_RE = re.compile(r'Order ID:\s*([\d-]+)')
+_ORDER_DATE_RE = re.compile(r'Order Date:\s*(.+?)(?:\n|Shipping)')
+_SHIPPING_RE = re.compile(r'Shipping Service:\s*(.+?)(?:\n|Buyer)')
+_SHIP_TO_RE = re.compile(r'Ship To:\s*\n\s*(.+?)(?:\n)')
+
+# A page is split into item sections once, at its SKU lines
+_SKU_LINE_RE = re.compile(r'SKU:\s*([^\n]+)')
+_QUANTITY_DIGITS_RE = re.compile(r'\d+')
+_COLOR_SUFFIX_RE = re.compile(r'\s+(?:Tax|Item|total|\$)')
+_MONOGRAM_INITIAL_RE = re.compile(r'-\s*([A-Z])\s*$')
+
+_FONT_VALUE = _value_pattern(r'\n|Font Color')
+_FONT_COLOR_VALUE = re.compile(r'\s*([^(#\n]+)')
+_GIFT_VALUE = _value_pattern(r'\n|Item|Grand|$')
+
+def _field_value(text, heading, pattern, start, end):
+    """Value after the first occurrence of heading in text[start:end]
+    
+    The stripped first group of pattern matched right after the heading, or
+    None when the heading is absent or no occurrence has a matching value.
+    """
+    at = text.find(heading, start, end)
+    while at >= 0:
+        match = pattern.match(text, at + len(heading), end)
+        if match:
+            return match.group(1).strip()
+        at = text.find(heading, at + 1, end)
+    return None
+
+def extract_line_items(text):
+    """Extract the LineItems on one page of a packing slip
+    
+    The page is split at its SKU lines once; each field is then located with
+    a substring search inside its item section and read with an anchored,
+    precompiled pattern that stops where the original per-field regexes
+    stopped.
+    """
+    sku_lines = list(_SKU_LINE_RE.finditer(text))
+    if not sku_lines:
+        return []
+    
+    # Quantity: first number after the first "Quantity" heading, if it appears
+    # before the SKU line
+    quantity_at = text.find('Quantity')
+    quantity_match = _QUANTITY_DIGITS_RE.search(text, quantity_at + 8) if quantity_at >= 0 else None
+    page_rule = None
+    
+    items = []
+    for n, sku_line in enumerate(sku_lines):
+        # Item section: from the end of this SKU line to the next one
+        start = sku_line.end()
+        end = sku_lines[n + 1].start() if n + 1 < len(sku_lines) else len(text)
+        
+        sku = sku_line.group(1).strip()
+        
+        if quantity_match and quantity_match.start() < sku_line.start():
+            quantity = int(text[quantity_match.start():min(quantity_match.end(), sku_line.start())])
+        else:
+            quantity = 1
+        
+        font = _field_value(text, 'Choose Your Font:', _FONT_VALUE, start, end) or ''
+        font_color = _field_value(text, 'Font Color:', _FONT_COLOR_VALUE, start, end) or ''
+        
+        # Parse SKU for product type and color
+        towel_color = sku.split('-')[-1].strip()
+        # Clean up color - remove any tax/price text that got captured
+        towel_color = _COLOR_SUFFIX_RE.split(towel_color)[0].strip()
+        
+        rule = _sku_rule(sku)
+        if rule is None:
+            if page_rule is None:
+                page_rule = _page_rule(text)
+            rule = page_rule
+        customizations = []
+        if rule.sku_initial:
+            initial_match = _MONOGRAM_INITIAL_RE.search(sku)
+            if initial_match:
+                initial = initial_match.group(1)
+                customizations = [(label, initial) for label in rule.sku_initial]
+        for label, heading, pattern in rule.fields:
+            value = _field_value(text, heading, pattern, start, end)
+            if value is not None:
+                customizations.append((label, value))
+        
+        # Gift message, falling back to the gift card text
+        gift_message = _field_value(text, 'Gift Message:', _GIFT_VALUE, start, end) or ''
+        if not gift_message:
+            gift_message = _field_value(text, 'Add Gift Card:', _GIFT_VALUE, start, end) or ''
+        
+        items.append(LineItem(sku, rule.product_type, towel_color, quantity, font, font_color, customizations,
+                              gift_message))
+    
+    return items
+
+def iter_stitched_orders(page_texts):
+    """Yield orders from page texts given in document order
+    
+    A page containing "Order ID:" starts a new order; pages without one
+    continue the current order, so orders spanning pages (or page ranges
+    extracted by different workers) are assembled the same way. Each order
+    is yielded as soon as the next one starts.
+    """
+    current_order = None
+    
+    for text in page_texts:
+        # Check if this is a new order (has "Order ID:")
+        if 'Order ID:' in text:
+            # Emit previous order if exists
+            if current_order and current_order.items:
+                yield current_order
+            
+            # Start new order and extract metadata
+            order_id_match = _ORDER_ID_RE.search(text)
+            date_match = _ORDER_DATE_RE.search(text)
+            shipping_match = _SHIPPING_RE.search(text)
+            # Get buyer name from Ship To section
+            ship_to_match = _SHIP_TO_RE.search(text)
+            current_order = Order(
+                order_id=order_id_match.group(1).strip() if order_id_match else '',
+                order_date=date_match.group(1).strip() if date_match else '',
+                buyer_name=ship_to_match.group(1).strip() if ship_to_match else '',
+                shipping_service=shipping_match.group(1).strip() if shipping_match else '',
+            )
+        
+        if current_order:
+            current_order.items.extend(extract_line_items(text))
+    
+    if current_order and current_order.items:
+        yield current_order
+
+def stitch_orders(page_texts):
+    """Assemble orders from page texts given in document order"""
+    return list(iter_stitched_orders(page_texts))
+
+# ==================== TEXT EXTRACTION BACKENDS ====================
+# Each backend yields the text of pages [start, stop) of a PDF in order.
+# pdfplumber pages cache their chars and layout until closed, so the
+# pdfplumber backends close each page once its text has been taken.
+
+def _layout_page_texts(pdf_file, start, stop):
+    """pdfplumber layout mode: extract_text() on every page (reference)"""
+    with pdfplumber.open(pdf_file) as pdf:
+        for page in pdf.pages[start:stop]:
+            yield page.extract_text()
+            page.close()
+
+def chars_to_text(chars):
+    """Join pdfplumber chars into lines by vertical position, without layout analysis"""
+    lines = []
+    line = []
+    line_top = None
+    for char in sorted(chars, key=lambda ch: ch['top']):
+        if line_top is None or char['top'] - line_top > CHAR_LINE_TOLERANCE:
+            if line:
+                lines.append(line)
+            line = []
+            line_top = char['top']
+        line.append(char)
+    if line:
+        lines.append(line)
+    
+    text_lines = []
+    for line in lines:
+        line.sort(key=lambda ch: ch['x0'])
+        parts = []
+        prev = None
+        for char in line:
+            if (prev is not None and char['x0'] - prev['x1'] > CHAR_SPACE_TOLERANCE
+                    and prev['text'] != ' ' and char['text'] != ' '):
+                parts.append(' ')
+            parts.append(char['text'])
+            prev = char
+        text_lines.append(''.join(parts).strip())
+    return '\n'.join(text_lines)
+
+def _chars_page_texts(pdf_file, start, stop):
+    """Raw-character mode: group pdfplumber's char stream into lines"""
+    with pdfplumber.open(pdf_file) as pdf:
+        for page in pdf.pages[start:stop]:
+            yield chars_to_text(page.chars)
+            page.close()
+
+def _pdfminer_page_texts(pdf_file, start, stop):
+    """pdfminer.six layout analysis without pdfplumber's object model"""
+    page_numbers = range(start, stop) if stop is not None else None
+    for n, layout in enumerate(extract_pages(pdf_file, page_numbers=page_numbers, laparams=LAParams())):
+        if page_numbers is None and n < start:
+            continue
+        yield ''.join(element.get_text() for element in layout if isinstance(element, LTTextContainer)).strip()
+
+# pdfium mode reads each page's text from pypdfium2's text page in one
+# call, with no layout analysis. Pages whose text has neither of these
+# carry no order data and are skipped.
+PDFIUM_PAGE_MARKERS = ('Order ID', 'SKU')
+
+# pdfium is not thread-safe, and Streamlit sessions run in threads
+_pdfium_lock = threading.Lock()
+
+def _reset_pdfium_lock():
+    global _pdfium_lock
+    _pdfium_lock = threading.Lock()
+
+# A forked worker must not inherit the lock held by another thread of its parent
+if hasattr(os, 'register_at_fork'):  # not on Windows
+    os.register_at_fork(after_in_child=_reset_pdfium_lock)
+
+def _pdf_source_bytes(pdf_file):
+    """Contents of a PDF given as a path or a binary file object"""
+    if isinstance(pdf_file, (str, os.PathLike)):
+        with open(pdf_file, 'rb') as f:
+            return f.read()
+    pdf_file.seek(0)
+    return pdf_file.read()
+
+def _pdfium_page_text(page):
+    """Full text of a pdfium page, '' for pages without order data, None without a text layer"""
+    textpage = page.get_textpage()
+    try:
+        if not textpage.count_chars():
+            return None  # no text layer pdfium can read; let pdfplumber decide
+        text = textpage.get_text_range().replace('\r\n', '\n').strip()
+    finally:
+        textpage.close()
+    if not any(marker in text for marker in PDFIUM_PAGE_MARKERS):
+        return ''
+    return text
+
+def _pdfium_page_texts(pdf_file, start, stop):
+    """pdfium mode: pypdfium2 page text, with pdfplumber text for pages pdfium cannot read
+    
+    Pages without an Order ID or SKU are skipped (empty text). pdfplumber is
+    only opened once a page has no text layer for pdfium.
+    """
+    pdf_bytes = _pdf_source_bytes(pdf_file)
+    with _pdfium_lock:
+        document = pdfium.PdfDocument(pdf_bytes)
+        page_count = len(document)
+    fallback = None
+    try:
+        for n in range(start, page_count if stop is None else min(stop, page_count)):
+            with _pdfium_lock:
+                page = document[n]
+                try:
+                    text = _pdfium_page_text(page)
+                finally:
+                    page.close()
+            if text is None:
+                if fallback is None:
+                    fallback = pdfplumber.open(BytesIO(pdf_bytes))
+                fallback_page = fallback.pages[n]
+                text = fallback_page.extract_text()
+                fallback_page.close()
+            yield text
+    finally:
+        if fallback is not None:
+            fallback.close()
+        with _pdfium_lock:
+            document.close()
+
+EXTRACTION_BACKENDS = {
+    'layout': _layout_page_texts,
+    'chars': _chars_page_texts,
+    'pdfminer': _pdfminer_page_texts,
+    'pdfium': _pdfium_page_texts,
+}
+
+def iter_page_texts(pdf_file, start=0, stop=None, backend=DEFAULT_BACKEND):
+    """Yield the text of pages [start, stop) using the named extraction backend"""
+    if backend not in EXTRACTION_BACKENDS:
+        raise ValueError(f"Unknown extraction backend: {backend}")
+    return EXTRACTION_BACKENDS[backend](pdf_file, start, stop)
+
+# ==================== PARSING ====================
+
+def _iter_orders_with_progress(page_texts, on_progress=None, timings=None):
+    """iter_stitched_orders, calling on_progress(pages=1) / on_progress(orders=1) as it goes
+    
+    With timings, the wait for each page is recorded as extract_page and the
+    rest of the time spent producing each order as parse_text.
+    """
+    if on_progress is None and timings is None:
+        yield from iter_stitched_orders(page_texts)
+        return
+    
+    outside = [0.0]  # time spent outside the text parser for the current order
+    
+    def counted_pages():
+        pages = iter(page_texts)
+        while True:
+            start = time.perf_counter()
+            text = next(pages, None)
+            if text is None:
+                return
+            waited = time.perf_counter() - start
+            if timings is not None:
+                timings.add('extract_page', waited)
+            yield text
+            if on_progress is not None:
+                resumed = time.perf_counter()
+                on_progress(pages=1)
+                waited += time.perf_counter() - resumed
+            outside[0] += waited
+    
+    orders = iter_stitched_orders(counted_pages())
+    while True:
+        start = time.perf_counter()
+        outside[0] = 0.0
+        order = next(orders, None)
+        if order is None:
+            return
+        if timings is not None:
+            timings.add('parse_text', time.perf_counter() - start - outside[0])
+        if on_progress is not None:
+            on_progress(orders=1)
+        yield order
+
+def iter_towel_orders(pdf_file, backend=DEFAULT_BACKEND, on_progress=None, timings=None):
+    """Yield orders one at a time while streaming through a packing slip PDF
+    
+    Pages are extracted lazily and released once read, so memory stays flat
+    however many pages the PDF has. on_progress, if given, is called with
+    pages=1 after each page and orders=1 for each order. timings, if given,
+    is a StageTimings that receives extract_page and parse_text times.
+    """
+    return _iter_orders_with_progress(iter_page_texts(pdf_file, backend=backend), on_progress, timings)
+
+def parse_towel_orders(pdf_file, backend=DEFAULT_BACKEND):
+    """Parse Amazon towel order PDFs"""
+    return list(iter_towel_orders(pdf_file, backend))
+
+def extract_page_texts(pdf_file, start=0, stop=None, backend=DEFAULT_BACKEND):
+    """Extract the text of pages [start, stop) of a PDF"""
+    return list(iter_page_texts(pdf_file, start, stop, backend))
+
+def count_pages(pdf_file):
+    """Number of pages in a PDF (path or file object)"""
+    with pdfplumber.open(pdf_file) as pdf:
+        return len(pdf.pages)
+
+def page_ranges(page_count, workers):
+    """Split page indices into contiguous (start, stop) ranges for the workers
+    
+    Several ranges per worker keep the pool busy when some pages are slower
+    to extract than others.
+    """
+    size = max(MIN_PAGES_PER_RANGE, -(-page_count // (workers * 4)))
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+def _init_page_worker(pdf_bytes, backend):
+    """Pool initializer: hand the document to the worker once, not per range"""
+    global _worker_pdf_bytes, _worker_backend
+    _worker_pdf_bytes = pdf_bytes
+    _worker_backend = backend
+
+def _extract_worker_range(page_range):
+    """Worker: (page texts of the range, seconds spent extracting them)"""
+    start, stop = page_range
+    began = time.perf_counter()
+    texts = extract_page_texts(BytesIO(_worker_pdf_bytes), start, stop, _worker_backend)
+    return texts, time.perf_counter() - began
+
+def parse_pdf_bytes(pdf_bytes, backend=DEFAULT_BACKEND, on_progress=None, timings=None):
+    """Parse a packing slip PDF given as raw bytes"""
+    if timings is None:
+        return list(iter_towel_orders(BytesIO(pdf_bytes), backend, on_progress))
+    with timings.stage('parse_file'):
+        return list(iter_towel_orders(BytesIO(pdf_bytes), backend, on_progress, timings))
+
+def parse_pdf_bytes_paged(pdf_bytes, workers=DEFAULT_PARSE_WORKERS, backend=DEFAULT_BACKEND, on_progress=None, timings=None):
+    """Parse one PDF by extracting page ranges in parallel workers
+    
+    Page texts come back in document order and are stitched into orders
+    sequentially, so the result is identical to parse_pdf_bytes. With
+    timings, extraction inside the workers is recorded as
+    extract_page_worker; extract_page is then the time spent waiting for it.
+    """
+    page_count = count_pages(BytesIO(pdf_bytes))
+    if workers <= 1 or page_count < PAGE_PARALLEL_MIN_PAGES:
+        return parse_pdf_bytes(pdf_bytes, backend, on_progress, timings)
+    
+    ranges = page_ranges(page_count, workers)
+    started = time.perf_counter()
+    pool = process_pool(min(workers, len(ranges)), initializer=_init_page_worker, initargs=(pdf_bytes, backend))
+    futures = [pool.submit(_extract_worker_range, page_range) for page_range in ranges]
+    
+    def page_texts():
+        for future in futures:
+            texts, seconds = _wait_result(future, on_progress)
+            if timings is not None:
+                timings.add('extract_page_worker', seconds, calls=len(texts))
+            yield from texts
+    
+    try:
+        orders = list(_iter_orders_with_progress(page_texts(), on_progress, timings))
+    except BaseException:
+        _abandon(pool, futures)
+        raise
+    pool.shutdown()
+    if timings is not None:
+        timings.add('parse_file', time.perf_counter() - started)
+    return orders
+
+def _parse_pdf_bytes_safe(pdf_bytes, parse=parse_pdf_bytes):
+    """Worker entry point: return (orders, error message) instead of raising"""
+    try:
+        return parse(pdf_bytes), None
+    except Exception as e:
+        return [], str(e)
+
+def _parse_pdf_bytes_timed(pdf_bytes, backend=DEFAULT_BACKEND):
+    """Worker entry point that also returns its own StageTimings"""
+    timings = StageTimings()
+    return _parse_pdf_bytes_safe(pdf_bytes, partial(parse_pdf_bytes, backend=backend, timings=timings)), timings
+
+def _process_context():
+    """multiprocessing context for worker pools
+    
+    Workers are never forked straight from the app, whose other threads
+    (Streamlit sessions, background jobs) may hold pdfium, pdfminer or
+    logging locks at that moment. Where available, a single-threaded fork
+    server that has already imported this module starts them; elsewhere
+    the platform default (spawn) does.
+    """
+    if 'forkserver' not in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context()
+    context = multiprocessing.get_context('forkserver')
+    context.set_forkserver_preload([__name__])
+    return context
+
+_mp_context = _process_context()
+
+def process_pool(workers, **kwargs):
+    """ProcessPoolExecutor whose workers are started from the forkserver/spawn context above"""
+    return ProcessPoolExecutor(max_workers=workers, mp_context=_mp_context, **kwargs)
+
+def _abandon(pool, futures):
+    """Shut a pool down without waiting: queued futures are cancelled, running ones finish in the background"""
+    for future in futures:
+        future.cancel()
+    pool.shutdown(wait=False)
+
+def _wait_result(future, heartbeat=None):
+    """future's result, calling heartbeat() every PROGRESS_HEARTBEAT seconds until it is ready"""
+    while not wait([future], timeout=PROGRESS_HEARTBEAT).done:
+        if heartbeat is not None:
+            heartbeat()
+    return future.result()
+
+def _completed(futures, heartbeat=None):
+    """Yield futures as they complete, calling heartbeat() every PROGRESS_HEARTBEAT seconds without one"""
+    pending = set(futures)
+    while pending:
+        done, pending = wait(pending, timeout=PROGRESS_HEARTBEAT, return_when=FIRST_COMPLETED)
+        if not done and heartbeat is not None:
+            heartbeat()
+        yield from done
+
+def _page_count_or_zero(pdf_bytes):
+    """Page count for progress reporting; unreadable files count as 0 pages"""
+    try:
+        return count_pages(BytesIO(pdf_bytes))
+    except Exception:
+        return 0  # reported as a parse error later
+
+def _batch_progress(progress, page_count):
+    """Turn progress(pages_done, page_count, orders_done) into an on_progress(pages, orders) counter"""
+    done = {'pages': 0, 'orders': 0}
+    
+    def on_progress(pages=0, orders=0):
+        done['pages'] += pages
+        done['orders'] += orders
+        progress(done['pages'], page_count, done['orders'])
+    
+    progress(0, page_count, 0)
+    return on_progress
+
+def parse_pdf_batch(pdf_blobs, workers=DEFAULT_PARSE_WORKERS, mode='auto', backend=DEFAULT_BACKEND, progress=None,
+                    timings=None):
+    """Parse several PDFs (raw bytes) using worker processes
+    
+    mode 'files' sends one file to each worker, 'pages' splits each file into
+    page ranges extracted in parallel, and 'auto' splits by page range only
+    when a single file is uploaded. Returns a list of (orders, error message)
+    tuples in input order. Small batches are parsed serially.
+    
+    progress, if given, is called as progress(pages_done, page_count,
+    orders_done) while the batch is parsed, and every PROGRESS_HEARTBEAT
+    seconds while waiting on workers; an exception raised by it stops the
+    batch without waiting for the workers. timings, if given, is a
+    StageTimings that receives per-page, per-order and per-file times, also
+    from worker processes.
+    """
+    if mode not in PARSE_MODES:
+        raise ValueError(f"Unknown parse mode: {mode}")
+    page_counts = on_progress = None
+    if progress is not None:
+        page_counts = [_page_count_or_zero(b) for b in pdf_blobs]
+        on_progress = _batch_progress(progress, sum(page_counts))
+    
+    if mode == 'pages' or (mode == 'auto' and len(pdf_blobs) == 1):
+        parse = partial(parse_pdf_bytes_paged, workers=workers, backend=backend, on_progress=on_progress, timings=timings)
+        return [_parse_pdf_bytes_safe(b, parse) for b in pdf_blobs]
+    
+    total_bytes = sum(len(b) for b in pdf_blobs)
+    if workers <= 1 or len(pdf_blobs) < 2 or total_bytes < PARALLEL_MIN_BYTES:
+        parse = partial(parse_pdf_bytes, backend=backend, on_progress=on_progress, timings=timings)
+        return [_parse_pdf_bytes_safe(b, parse) for b in pdf_blobs]
+    
+    # Workers cannot report pages as they go; progress advances per file
+    if timings is None:
+        parse = partial(_parse_pdf_bytes_safe, parse=partial(parse_pdf_bytes, backend=backend))
+    else:
+        parse = partial(_parse_pdf_bytes_timed, backend=backend)
+    results = [None] * len(pdf_blobs)
+    pool = process_pool(min(workers, len(pdf_blobs)))
+    futures = {pool.submit(parse, b): i for i, b in enumerate(pdf_blobs)}
+    try:
+        for future in _completed(futures, on_progress):
+            i = futures[future]
+            results[i] = future.result()
+            if timings is not None:
+                results[i], worker_timings = results[i]
+                timings.merge(worker_timings)
+            if on_progress is not None:
+                on_progress(pages=page_counts[i], orders=len(results[i][0]))
+    except BaseException:
+        _abandon(pool, futures)
+        raise
+    pool.shutdown()
+    return results
+
+# ==================== ORDER TABLE & EXPORTS ====================
+
+def unique_orders(orders):
+    """orders without repeats of an earlier order with the same Order ID and items
+    
+    Overlapping slip files list the same order twice. Dropping the repeat
+    before items are numbered keeps each item's (Order ID, item position)
+    the same across uploads, so printed items are still recognized.
+    """
+    seen = {}
+    unique = []
+    for order in orders:
+        earlier = seen.setdefault(order.order_id, [])
+        if order.items in earlier:
+            continue
+        earlier.append(order.items)
+        unique.append(order)
+    return unique
+
+def iter_order_items(orders):
+    """Yield (order, item, item_number, item_count) for every line item
+    
+    Items are numbered per Order ID across all orders, so an order split
+    over several uploads is still counted as one.
+    """
+    counts = {}
+    for order in orders:
+        counts[order.order_id] = counts.get(order.order_id, 0) + len(order.items)
+    
+    seen = {}
+    for order in orders:
+        for item in order.items:
+            seen[order.order_id] = seen.get(order.order_id, 0) + 1
+            yield order, item, seen[order.order_id], counts[order.order_id]
+
+def label_records(orders):
+    """label_data dict for every line item; record i is row i + 1 of orders_to_dataframe"""
+    return [label_data(order, item, item_number, item_count)
+            for order, item, item_number, item_count in iter_order_items(orders)]
+
+def orders_to_dataframe(orders, records=None):
+    """Flat table of line items, indexed from 1, with item counters
+    
+    Pass records if label_records(orders) was already built.
+    """
+    if records is None:
+        records = label_records(orders)
+    
+    def column(key):
+        return [record[key] for record in records]
+    
+    df = pd.DataFrame({
+        'Order ID': column('order_id'),
+        'Date': column('date'),
+        'Buyer': column('buyer'),
+        'Shipping': column('shipping'),
+        'Product Type': column('product_type'),
+        'Color': column('towel_color'),
+        'Quantity': column('quantity'),
+        'Font': column('font'),
+        'Thread Color': column('thread_color'),
+        'Customizations': [' | '.join([f"{l}: {t}" for l, t in r['customizations']]) for r in records],
+        'Gift Message': ['YES' if r['has_gift_note'] else 'NO' for r in records],
+        'item_count': column('item_count'),
+        'item_number': column('item_number')
+    })
+    # Index from 1 instead of 0
+    df.index = range(1, len(df) + 1)
+    return df
+
+def export_csv(df):
+    """CSV export of the order table"""
+    return df.to_csv(index=True).encode('utf-8')
+
+# Manufacturing plan tables added as extra sheets by export_xlsx(..., plan=...)
+PLAN_SHEETS = (
+    ('Thread Colors', 'thread_summary'),
+    ('Towel Colors', 'color_summary'),
+    ('Blanks to Pull', 'blanks'),
+    ('Product Types', 'product_summary'),
+    ('Color x Thread', 'matrix'),
+)
+
+def _write_sheet(workbook, name, table, header_format):
+    """Write a table row by row (index first), as constant_memory mode requires"""
+    worksheet = workbook.add_worksheet(name)
+    index_names = [n for n in table.index.names if n is not None] or ['']
+    worksheet.write_row(0, 0, index_names[:1] + [str(c) for c in table.columns], header_format)
+    for row_number, row in enumerate(table.itertuples(name=None), start=1):
+        worksheet.write_row(row_number, 0, row)
+
+def export_xlsx(df, plan=None):
+    """Excel export of the order table, optionally with manufacturing_plan() sheets
+    
+    Rows are streamed with xlsxwriter's constant_memory mode, so worksheet
+    data is flushed to temporary files row by row instead of held in memory.
+    """
+    buffer = BytesIO()
+    workbook = xlsxwriter.Workbook(buffer, {'constant_memory': True})
+    header_format = workbook.add_format({'bold': True, 'border': 1})
+    _write_sheet(workbook, 'Orders', df, header_format)
+    if plan is not None:
+        for sheet_name, key in PLAN_SHEETS:
+            _write_sheet(workbook, sheet_name, plan[key], header_format)
+    workbook.close()
+    return buffer.getvalue()
+
+# ==================== MANUFACTURING PLAN ====================
+
+# Blank towels pulled and production units per unit ordered of each product type, from PRODUCT_RULES
+COMPONENTS = ('Washcloths', 'Hand Towels', 'Bath Towels', 'Bath Sheets')
+PRODUCT_COMPONENTS = pd.DataFrame(
+    [[rule['components'].get(component, 0) for component in COMPONENTS] for rule in PRODUCT_RULES],
+    index=[rule['product_type'] for rule in PRODUCT_RULES], columns=list(COMPONENTS)
+)
+PRODUCT_UNITS = pd.Series([rule['production_units'] for rule in PRODUCT_RULES],
+                          index=[rule['product_type'] for rule in PRODUCT_RULES])
+
+def _with_totals(table):
+    """Table with a TOTAL column and a TOTAL row"""
+    table = table.copy()
+    table['TOTAL'] = table.sum(axis=1)
+    table.loc['TOTAL'] = table.sum()
+    return table
+
+def manufacturing_plan(df):
+    """Production summaries of an order table, computed in one vectorized pass
+    
+    Production units and component counts per product come from
+    PRODUCT_RULES (6-pc sets count as 2 units, 2x 3-pc sets, for
+    embroidery; unknown products as 1); components give the blanks to pull
+    per towel color. Everything is derived from a single groupby over
+    (color, thread color, product type).
+    """
+    quantity = df['Quantity'].astype(int)
+    units = PRODUCT_UNITS.reindex(df['Product Type'], fill_value=1).to_numpy()
+    components = PRODUCT_COMPONENTS.reindex(df['Product Type'], fill_value=0).to_numpy() * quantity.to_numpy()[:, None]
+    
+    items = pd.DataFrame(components, columns=list(COMPONENTS), index=df.index)
+    items['Color'] = df['Color']
+    items['Thread Color'] = df['Thread Color']
+    items['Product Type'] = df['Product Type']
+    items['Ordered Qty'] = quantity
+    items['Production Units'] = quantity * units
+    items['Line Items'] = 1
+    grouped = items.groupby(['Color', 'Thread Color', 'Product Type']).sum()
+    
+    thread_summary = grouped.groupby(level='Thread Color')[['Production Units', 'Line Items']].sum()
+    thread_summary = thread_summary.rename(columns={'Production Units': 'Sets to Embroider'})
+    thread_summary = thread_summary.sort_values('Sets to Embroider', ascending=False)
+    
+    color_summary = grouped.groupby(level='Color')[['Production Units', 'Line Items']].sum()
+    color_summary = color_summary.rename(columns={'Production Units': 'Sets Needed'})
+    color_summary = color_summary.sort_values('Sets Needed', ascending=False)
+    
+    product_summary = grouped.groupby(level='Product Type')[['Ordered Qty', 'Production Units', 'Line Items']].sum()
+    product_summary = product_summary.sort_values('Production Units', ascending=False)
+    
+    matrix = grouped.groupby(level=['Color', 'Thread Color'])['Production Units'].sum().unstack(fill_value=0)
+    blanks = grouped.groupby(level='Color')[list(COMPONENTS)].sum()
+    
+    return {
+        'order_count': df['Order ID'].nunique(),
+        'line_items': len(df),
+        'production_units': int(items['Production Units'].sum()),
+        'gift_notes': int((df['Gift Message'] == 'YES').sum()),
+        'thread_summary': thread_summary,
+        'color_summary': color_summary,
+        'product_summary': product_summary,
+        'matrix': _with_totals(matrix),
+        'blanks': _with_totals(blanks),
+    }
+
+# ==================== PRODUCTION SEQUENCING ====================
+
+# Shipping service keywords (lowercase, without spaces or hyphens) -> urgency rank, 0 ships first
+SHIPPING_PRIORITY = (
+    ('sameday', 0),
+    ('nextday', 0),
+    ('oneday', 0),
+    ('secondday', 1),
+    ('twoday', 1),
+    ('priority', 2),
+    ('expedited', 2),
+)
+STANDARD_SHIPPING_PRIORITY = 3
+
+# Relative cost of changing the embroidery thread vs pulling another blank color
+THREAD_CHANGEOVER_COST = 2
+BLANK_CHANGEOVER_COST = 1
+
+def shipping_priority(service):
+    """Urgency rank of a shipping service; unknown services count as standard"""
+    service = re.sub(r'[\s-]', '', service.lower())
+    for keyword, rank in SHIPPING_PRIORITY:
+        if keyword in service:
+            return rank
+    return STANDARD_SHIPPING_PRIORITY
+
+def changeovers(rows):
+    """Thread and blank (towel color) changes when rows are produced in their current order"""
+    def changes(column):
+        return max(int(column.ne(column.shift()).sum()) - 1, 0)
+    
+    thread, blank = changes(rows['Thread Color']), changes(rows['Color'])
+    return {'thread': thread, 'blank': blank, 'total': thread + blank}
+
+def _changeover_cost(current, key):
+    if current is None:
+        return 0
+    return (THREAD_CHANGEOVER_COST * (current[0] != key[0])
+            + BLANK_CHANGEOVER_COST * (current[1] != key[1]))
+
+def production_sequence(rows, thread_order=()):
+    """Index of rows (an order table) reordered to minimize thread and blank changeovers
+    
+    Orders are sequenced as units, so the items of a multi-item order stay
+    together, and more urgent shipping services come first. Within each
+    urgency tier, orders whose items share one (thread color, towel color)
+    run as a group; the next group or mixed order is always the cheapest
+    changeover from the current setup, and a mixed order may be run from
+    either end. Ties go to threads earlier in thread_order (e.g. the
+    manufacturing plan's thread summary, largest first), then to larger
+    groups.
+    """
+    thread_rank = {thread: rank for rank, thread in enumerate(thread_order)}
+    
+    def item_order(item):
+        (thread, color), _ = item
+        return thread_rank.get(thread, len(thread_rank)), thread, color
+    
+    orders = {}
+    for idx, order_id, thread, color, shipping in zip(rows.index, rows['Order ID'], rows['Thread Color'],
+                                                      rows['Color'], rows['Shipping']):
+        order = orders.setdefault(order_id, {'priority': shipping_priority(shipping), 'items': []})
+        order['items'].append(((thread, color), idx))
+    
+    tiers = {}
+    for order_id, order in orders.items():
+        order['items'].sort(key=item_order)
+        tiers.setdefault(order['priority'], []).append((order_id, order['items']))
+    
+    sequence = []
+    current = None
+    for priority in sorted(tiers):
+        # Single-setup orders grouped by setup; mixed orders listed under both end setups
+        single, mixed = {}, {}
+        for order_id, items in tiers[priority]:
+            first, last = items[0][0], items[-1][0]
+            if all(key == first for key, _ in items):
+                single.setdefault(first, []).extend(idx for _, idx in items)
+            else:
+                mixed.setdefault(first, []).append((order_id, items))
+                mixed.setdefault(last, []).append((order_id, items[::-1]))
+        done = set()
+        
+        while single or mixed:
+            candidates = [(key, False) for key in single] + [(key, True) for key in mixed]
+            key, is_mixed = min(candidates, key=lambda c: (_changeover_cost(current, c[0]), c[1],
+                                                           thread_rank.get(c[0][0], len(thread_rank)),
+                                                           -len(single.get(c[0], ())), c[0]))
+            if not is_mixed:
+                sequence.extend(single.pop(key))
+                current = key
+                continue
+            order_id, items = mixed[key].pop()
+            if not mixed[key]:
+                del mixed[key]
+            if order_id in done:
+                continue
+            done.add(order_id)
+            sequence.extend(idx for _, idx in items)
+            current = items[-1][0]
+    return sequence
+
+def production_runs(rows):
+    """Consecutive runs of one (thread color, towel color) setup, with their label counts"""
+    setup = rows[['Thread Color', 'Color']]
+    run = setup.ne(setup.shift()).any(axis=1).cumsum()
+    grouped = setup.groupby(run.to_numpy())
+    runs = grouped.first()
+    runs['Labels'] = grouped.size()
+    runs.index = range(1, len(runs) + 1)
+    return runs
+
+# ==================== LABEL RENDERING ====================
+
+# Color translations (English to Spanish)
+COLOR_TRANSLATIONS = {
+    'WHITE': 'Blanco',
+    'BLACK': 'Negro',
+    'NAVY': 'Azul Marino',
+    'NAVY BLUE': 'Azul Marino',
+    'GOLD': 'Oro',
+    'SILVER': 'Plata',
+    'RED': 'Rojo',
+    'BLUE': 'Azul',
+    'MID BLUE': 'Azul Medio',
+    'LIGHT BLUE': 'Azul Claro',
+    'DARK BLUE': 'Azul Oscuro',
+    'GREEN': 'Verde',
+    'LIGHT GREEN': 'Verde Claro',
+    'DARK GREEN': 'Verde Oscuro',
+    'GREY': 'Gris',
+    'GRAY': 'Gris',
+    'LIGHT GREY': 'Gris Claro',
+    'LIGHT GRAY': 'Gris Claro',
+    'DARK GREY': 'Gris Oscuro',
+    'DARK GRAY': 'Gris Oscuro',
+    'BROWN': 'Marrón',
+    'PINK': 'Rosa',
+    'LIGHT PINK': 'Rosa Claro',
+    'HOT PINK': 'Rosa Fuerte',
+    'PURPLE': 'Morado',
+    'YELLOW': 'Amarillo',
+    'ORANGE': 'Naranja',
+    'CREAM': 'Crema',
+    'BEIGE': 'Beige',
+    'TAN': 'Bronceado',
+    'BURGUNDY': 'Burdeos',
+    'MAROON': 'Granate'
+}
+
+def get_spanish_color(english_color):
+    """Get Spanish translation of color name"""
+    color_upper = english_color.upper().strip()
+    return COLOR_TRANSLATIONS.get(color_upper, english_color)
+
+def label_data(order, item, item_number, item_count):
+    """Fields printed on one manufacturing label, from an Order and one of its LineItems"""
+    return {
+        'order_id': order.order_id,
+        'buyer': order.buyer_name,
+        'date': order.order_date,
+        'shipping': order.shipping_service,
+        'quantity': item.quantity,
+        'product_type': item.product_type,
+        'towel_color': item.towel_color,
+        'thread_color': item.font_color,
+        'font': item.font,
+        'customizations': item.customizations,
+        'has_gift_note': bool(item.gift_message),
+        'gift_message': item.gift_message,
+        'item_number': item_number,
+        'item_count': item_count
+    }
+
+# Reusable per-document forms (PDF XObjects) holding the static layer of each label
+MFG_LABEL_FORM = 'MfgLabel'
+MFG_GIFT_BOX_FORM = 'MfgGiftBox'
+GIFT_NOTE_FORM = 'GiftNote'
+
+def _manufacturing_label_layout():
+    """Fixed coordinates of the manufacturing label (every label shares them)"""
+    W, H = LABEL_PAGESIZE
+    left = 0.25 * inch
+    right = W - 0.25 * inch
+    
+    # Header rows
+    header_y = H - 0.25 * inch
+    order_y = header_y - 0.16 * inch
+    date_y = order_y - 0.15 * inch
+    divider_y = date_y - 0.22 * inch
+    
+    # Two-column section
+    content_top = divider_y - 0.15 * inch
+    content_height = 2.4 * inch
+    total_width = right - left
+    left_col_width = total_width * 0.40
+    left_col_right = left + left_col_width
+    
+    # Left column rows
+    product_heading_y = content_top - 0.12 * inch
+    product_y = product_heading_y - 0.24 * inch
+    product_divider_y = product_y - 0.32 * inch
+    color_heading_y = product_divider_y - 0.24 * inch
+    color_y = color_heading_y - 0.22 * inch
+    color_divider_y = color_y - 0.34 * inch
+    thread_heading_y = color_divider_y - 0.24 * inch
+    thread_y = thread_heading_y - 0.2 * inch
+    
+    return {
+        'left': left,
+        'right': right,
+        'header_y': header_y,
+        'order_y': order_y,
+        'date_y': date_y,
+        'divider_y': divider_y,
+        'content_top': content_top,
+        'content_height': content_height,
+        'content_bottom': content_top - content_height,
+        'left_col_right': left_col_right,
+        'right_col_left': left_col_right + 0.1 * inch,
+        'col_center': left + (left_col_width / 2),
+        'product_heading_y': product_heading_y,
+        'product_y': product_y,
+        'product_divider_y': product_divider_y,
+        'color_heading_y': color_heading_y,
+        'color_y': color_y,
+        'color_divider_y': color_divider_y,
+        'thread_heading_y': thread_heading_y,
+        'thread_y': thread_y,
+        'spanish_y': thread_y - 0.14 * inch,
+        'personalization_y': content_top - 0.12 * inch,
+        'gift_box_y': content_top - content_height - 0.15 * inch,
+    }
+
+MFG_LAYOUT = _manufacturing_label_layout()
+
+def draw_manufacturing_label_template(c):
+    """Static layer of a manufacturing label: rules, borders and headings"""
+    L = MFG_LAYOUT
+    left, right = L['left'], L['right']
+    
+    # Thick divider under the header
+    c.setStrokeColor(colors.black)
+    c.setLineWidth(2)
+    c.line(left, L['divider_y'], right, L['divider_y'])
+    
+    # Outer border of the two-column section
+    c.setLineWidth(2)
+    c.rect(left, L['content_bottom'], right - left, L['content_height'], stroke=1, fill=0)
+    
+    # Vertical divider
+    c.setLineWidth(1.5)
+    c.line(L['left_col_right'] + 0.05 * inch, L['content_top'],
+           L['left_col_right'] + 0.05 * inch, L['content_bottom'])
+    
+    # Left column headings and dividers
+    c.setFont("Helvetica", 8)
+    c.drawCentredString(L['col_center'], L['product_heading_y'], "PRODUCT TYPE:")
+    c.drawCentredString(L['col_center'], L['color_heading_y'], "COLOR:")
+    c.drawCentredString(L['col_center'], L['thread_heading_y'], "THREAD COLOR:")
+    c.setLineWidth(0.5)
+    c.line(left + 0.05 * inch, L['product_divider_y'], L['left_col_right'] - 0.05 * inch, L['product_divider_y'])
+    c.line(left + 0.05 * inch, L['color_divider_y'], L['left_col_right'] - 0.05 * inch, L['color_divider_y'])
+    
+    # Right column heading
+    c.setFont("Helvetica-Bold", 9)
+    c.drawString(L['right_col_left'] + 0.05 * inch, L['personalization_y'], "PERSONALIZATION:")
+
+def draw_manufacturing_gift_box(c):
+    """Gift note indicator box at the bottom of a manufacturing label"""
+    L = MFG_LAYOUT
+    gift_box_height = 0.25 * inch
+    c.setStrokeColor(colors.black)
+    c.setLineWidth(2)
+    c.rect(L['left'], L['gift_box_y'] - gift_box_height, L['right'] - L['left'], gift_box_height, stroke=1, fill=0)
+    c.setFont("Helvetica-Bold", 10)
+    c.drawString(L['left'] + 0.1 * inch, L['gift_box_y'] - 0.16 * inch, "🎁 GIFT NOTE: YES")
+
+def draw_manufacturing_label_fields(c, data):
+    """Variable text of one manufacturing label"""
+    L = MFG_LAYOUT
+    left, right = L['left'], L['right']
+    y = L['header_y']
+    
+    # ============ HEADER: BUYER NAME & ORDER INFO ============
+    # Buyer name (bold, 13pt)
+    c.setFont("Helvetica-Bold", 13)
+    c.drawString(left, y, data['buyer'])
+    
+    # QTY and Item Counter Badge
+    if data['quantity'] > 2:
+        c.setFont("Helvetica-BoldOblique", 15)
+    else:
+        c.setFont("Helvetica-Bold", 15)
+    
+    # Show item counter badge only if order has multiple items
+    if data['item_count'] > 1:
+        c.drawRightString(right - 0.85 * inch, y, f"QTY: {data['quantity']}")
+        
+        # Item counter badge with warning triangle [2 of 3]
+        c.setFont("Helvetica-Bold", 11)
+        c.drawRightString(right, y, f"▲ [{data['item_number']} of {data['item_count']}]")
+    else:
+        # Single item - just show QTY
+        c.drawRightString(right, y, f"QTY: {data['quantity']}")
+    
+    # Order ID (regular, 11pt) and shipping
+    c.setFont("Helvetica", 11)
+    c.drawString(left, L['order_y'], f"Order: {data['order_id']}")
+    c.setFont("Helvetica", 9)
+    c.drawRightString(right, L['order_y'], data['shipping'])
+    
+    # Date
+    c.drawString(left, L['date_y'], data['date'])
+    
+    # ========== LEFT COLUMN: PRODUCT SPECS ==========
+    col_center = L['col_center']
+    c.setFont("Helvetica-Bold", 13)
+    c.drawCentredString(col_center, L['product_y'], data['product_type'].upper())
+    
+    # Color (ALL CAPS, centered, BOLD)
+    c.setFont("Helvetica-Bold", 16)
+    c.drawCentredString(col_center, L['color_y'], data['towel_color'].upper())
+    
+    # Thread color (English, then Spanish translation)
+    c.setFont("Helvetica-Bold", 15)
+    c.drawCentredString(col_center, L['thread_y'], data['thread_color'].upper())
+    c.setFont("Helvetica", 10)
+    c.drawCentredString(col_center, L['spanish_y'], get_spanish_color(data['thread_color']))
+    
+    # ========== RIGHT COLUMN: PERSONALIZATION ==========
+    col_y = L['personalization_y'] - 0.24 * inch
+    text_left = L['right_col_left'] + 0.08 * inch
+    for label, text in data['customizations']:
+        if col_y > L['content_bottom'] + 0.2 * inch:
+            # Label (11pt, regular font)
+            c.setFont("Helvetica", 11)
+            c.drawString(text_left, col_y, f"{label}:")
+            col_y -= 0.18 * inch
+            
+            # Personalization text (15pt, bold italic)
+            c.setFont("Helvetica-BoldOblique", 15)
+            c.drawString(text_left, col_y, text)
+            col_y -= 0.24 * inch
+
+def generate_manufacturing_label(c, data, is_first=True):
+    """Generate two-column manufacturing label"""
+    draw_manufacturing_label_template(c)
+    if data['has_gift_note']:
+        draw_manufacturing_gift_box(c)
+    draw_manufacturing_label_fields(c, data)
+
+def draw_gift_note_template(c):
+    """Static layer of a gift note: double border, corner flowers and heart"""
+    W, H = LABEL_PAGESIZE
+    
+    # Decorative border
+    margin = 0.4 * inch
+    c.setStrokeColor(colors.HexColor('#8B4513'))
+    c.setLineWidth(3)
+    c.rect(margin, margin, W - 2*margin, H - 2*margin, stroke=1, fill=0)
+    
+    # Inner border
+    c.setLineWidth(1)
+    c.rect(margin + 0.1*inch, margin + 0.1*inch, 
+           W - 2*margin - 0.2*inch, H - 2*margin - 0.2*inch, 
+           stroke=1, fill=0)
+    
+    # Decorative corners
+    corners = [
+        (margin + 0.15*inch, H - margin - 0.15*inch),
+        (W - margin - 0.15*inch, H - margin - 0.15*inch),
+        (margin + 0.15*inch, margin + 0.15*inch),
+        (W - margin - 0.15*inch, margin + 0.15*inch)
+    ]
+    
+    c.setFont("Helvetica", 16)
+    c.setFillColor(colors.HexColor('#D4A574'))
+    for x, y in corners:
+        c.drawCentredString(x, y - 0.05*inch, "❀")
+    
+    # Heart at top
+    c.setFont("Helvetica", 20)
+    c.setFillColor(colors.HexColor('#C64A7B'))
+    c.drawCentredString(W / 2, H - margin - 0.5*inch, "♥")
+
+def draw_gift_note_fields(c, order_id, buyer_name, gift_message):
+    """Variable text of one gift note"""
+    W, H = LABEL_PAGESIZE
+    margin = 0.4 * inch
+    
+    # Gift message (centered, wrapped)
+    y = H / 2 + 0.3 * inch
+    c.setFont("Helvetica-Oblique", 14)
+    c.setFillColor(colors.HexColor('#4A4A4A'))
+    
+    max_width = W - 2*margin - 0.8*inch
+    lines = simpleSplit(gift_message, "Helvetica-Oblique", 14, max_width)
+    
+    for line in lines:
+        c.drawCentredString(W / 2, y, line)
+        y -= 0.22 * inch
+    
+    # Recipient name at bottom
+    c.setFont("Helvetica-Bold", 12)
+    c.setFillColor(colors.HexColor('#8B4513'))
+    c.drawCentredString(W / 2, margin + 0.6*inch, f"To: {buyer_name}")
+    
+    # Order reference
+    c.setFont("Helvetica", 7)
+    c.setFillColor(colors.grey)
+    c.drawRightString(W - margin - 0.15*inch, margin + 0.2*inch, f"Order: {order_id}")
+
+def generate_gift_note(c, order_id, buyer_name, gift_message):
+    """Generate elegant gift note label"""
+    draw_gift_note_template(c)
+    draw_gift_note_fields(c, order_id, buyer_name, gift_message)
+
+def define_form(c, name, draw):
+    """Record draw(c) once as a named form that pages reuse with c.doForm(name)"""
+    c.beginForm(name)
+    draw(c)
+    c.endForm()
+
+def gift_note_data(record):
+    """(order_id, buyer_name, gift_message) printed on the gift note of a label record"""
+    return record['order_id'], record['buyer'], record['gift_message']
+
+def render_manufacturing_labels(labels, use_forms=True, timings=None, on_page=None):
+    """PDF bytes with one manufacturing label page per label_data dict
+    
+    With use_forms the static layer is stored once per document and each
+    page only carries its own text. timings, if given, receives the time of
+    each page (render_label) and of writing the PDF (save_pdf). on_page, if
+    given, is called after each page is drawn.
+    """
+    output = BytesIO()
+    c = canvas.Canvas(output, pagesize=LABEL_PAGESIZE)
+    if use_forms:
+        define_form(c, MFG_LABEL_FORM, draw_manufacturing_label_template)
+        define_form(c, MFG_GIFT_BOX_FORM, draw_manufacturing_gift_box)
+    for data in labels:
+        start = time.perf_counter()
+        if use_forms:
+            c.doForm(MFG_LABEL_FORM)
+            if data['has_gift_note']:
+                c.doForm(MFG_GIFT_BOX_FORM)
+            draw_manufacturing_label_fields(c, data)
+        else:
+            generate_manufacturing_label(c, data)
+        c.showPage()
+        if timings is not None:
+            timings.add('render_label', time.perf_counter() - start)
+        if on_page is not None:
+            on_page()
+    return _save_canvas(c, output, timings)
+
+def render_gift_notes(notes, use_forms=True, timings=None, on_page=None):
+    """PDF bytes with one gift note page per (order_id, buyer_name, gift_message)"""
+    output = BytesIO()
+    c = canvas.Canvas(output, pagesize=LABEL_PAGESIZE)
+    if use_forms:
+        define_form(c, GIFT_NOTE_FORM, draw_gift_note_template)
+    for order_id, buyer_name, gift_message in notes:
+        start = time.perf_counter()
+        if use_forms:
+            c.doForm(GIFT_NOTE_FORM)
+            draw_gift_note_fields(c, order_id, buyer_name, gift_message)
+        else:
+            generate_gift_note(c, order_id, buyer_name, gift_message)
+        c.showPage()
+        if timings is not None:
+            timings.add('render_gift_note', time.perf_counter() - start)
+        if on_page is not None:
+            on_page()
+    return _save_canvas(c, output, timings)
+
+def _save_canvas(c, output, timings=None):
+    """Finish the canvas and return the PDF bytes written to output"""
+    start = time.perf_counter()
+    c.save()
+    if timings is not None:
+        timings.add('save_pdf', time.perf_counter() - start)
+    return output.getvalue()
+
+def render_shards(page_count, workers):
+    """Split label indices into contiguous (start, stop) shards for the workers"""
+    size = max(MIN_PAGES_PER_SHARD, -(-page_count // (workers * 2)))
+    return [(start, min(start + size, page_count)) for start in range(0, page_count, size)]
+
+def concat_pdfs(pdf_blobs):
+    """One PDF (bytes) with the pages of every document, in order"""
+    with _pdfium_lock:
+        merged = pdfium.PdfDocument.new()
+        sources = [pdfium.PdfDocument(blob) for blob in pdf_blobs]
+        try:
+            for source in sources:
+                merged.import_pages(source)
+            output = BytesIO()
+            merged.save(output)
+            return output.getvalue()
+        finally:
+            for source in sources:
+                source.close()
+            merged.close()
+
+def _init_render_worker(pages_rendered):
+    """Pool initializer: the counter of pages drawn by all workers of the pool"""
+    global _worker_pages_rendered
+    _worker_pages_rendered = pages_rendered
+
+def _count_rendered_page():
+    with _worker_pages_rendered.get_lock():
+        _worker_pages_rendered.value += 1
+
+def _render_shard(render, timed, items):
+    """Worker: PDF bytes of a shard, with its StageTimings when timed; counts pages as they are drawn"""
+    if not timed:
+        return render(items, on_page=_count_rendered_page)
+    timings = StageTimings()
+    return render(items, timings=timings, on_page=_count_rendered_page), timings
+
+def _page_progress(progress, page_count):
+    """on_page callback calling progress(pages_done, page_count) after each page; None without progress"""
+    if progress is None:
+        return None
+    done = 0
+    
+    def on_page():
+        nonlocal done
+        done += 1
+        progress(done, page_count)
+    
+    return on_page
+
+def render_sharded(render, items, workers=DEFAULT_PARSE_WORKERS, timings=None, progress=None, on_partial=None):
+    """Render items with render_manufacturing_labels or render_gift_notes in parallel
+    
+    Items are split into contiguous shards, each rendered to its own PDF in
+    a worker process, and the shard PDFs are concatenated in input order.
+    Small documents are rendered serially. progress, if given, is called as
+    progress(items_done, item_count) after each page, or every
+    PROGRESS_HEARTBEAT seconds while waiting on workers; an exception raised
+    by it stops the render without waiting for the workers.
+    
+    on_partial, if given, is called as on_partial(pdf_bytes, count) with the
+    first count pages whenever more of them are finished (at most every
+    PARTIAL_INTERVAL seconds), so they can be printed while the rest render.
+    Shards then hold at most RENDER_CHUNK_PAGES items, also when rendering
+    serially.
+    """
+    count = len(items)
+    if progress is not None:
+        progress(0, count)
+    parallel = workers > 1 and count >= PARALLEL_RENDER_MIN_PAGES
+    if not parallel and on_partial is None:
+        return render(items, timings=timings, on_page=_page_progress(progress, count))
+    
+    spans = render_shards(count, workers) if parallel else [(0, count)]
+    if on_partial is not None:
+        spans = [(start, min(start + RENDER_CHUNK_PAGES, stop))
+                 for first, stop in spans for start in range(first, stop, RENDER_CHUNK_PAGES)]
+    shards = [items[start:stop] for start, stop in spans]
+    parts = []
+    partial_at = 0.0
+    
+    def finished(part):
+        nonlocal partial_at
+        parts.append(part)
+        if on_partial is not None and len(parts) < len(shards) and time.monotonic() - partial_at >= PARTIAL_INTERVAL:
+            on_partial(concat_pdfs(parts), spans[len(parts) - 1][1])
+            partial_at = time.monotonic()
+    
+    if parallel:
+        pages_rendered = _mp_context.Value('i', 0)
+        pool = process_pool(min(workers, len(shards)), initializer=_init_render_worker, initargs=(pages_rendered,))
+        futures = [pool.submit(_render_shard, render, timings is not None, shard) for shard in shards]
+        heartbeat = None if progress is None else lambda: progress(pages_rendered.value, count)
+        try:
+            for future in futures:
+                part = _wait_result(future, heartbeat)
+                if timings is not None:
+                    part, shard_timings = part
+                    timings.merge(shard_timings)
+                finished(part)
+                if heartbeat is not None:
+                    heartbeat()
+        except BaseException:
+            _abandon(pool, futures)
+            raise
+        pool.shutdown()
+    else:
+        on_page = _page_progress(progress, count)
+        for shard in shards:
+            finished(render(shard, timings=timings, on_page=on_page))
+    
+    if len(parts) == 1:
+        return parts[0]
+    if timings is None:
+        return concat_pdfs(parts)
+    with timings.stage('concat_pdf'):
+        return concat_pdfs(parts)
+
+def page_cache_key(kind, record):
+    """Stable hash of everything printed on one page ('label' data dict or gift note tuple)"""
+    payload = json.dumps([kind, record], sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+def split_pdf_pages(pdf_bytes):
+    """Single-page PDFs (bytes) for every page of a document"""
+    pages = []
+    with _pdfium_lock:
+        source = pdfium.PdfDocument(pdf_bytes)
+        try:
+            for index in range(len(source)):
+                page_doc = pdfium.PdfDocument.new()
+                page_doc.import_pages(source, [index])
+                output = BytesIO()
+                page_doc.save(output)
+                page_doc.close()
+                pages.append(output.getvalue())
+        finally:
+            source.close()
+    return pages
+
+def cache_rendered_pages(pdf_bytes, records, cache, kind):
+    """Store each page of an already rendered document under its record's key"""
+    for record, page in zip(records, split_pdf_pages(pdf_bytes)):
+        cache.put(page_cache_key(kind, record), page)
+
+def render_cached(render, records, cache, kind, timings=None):
+    """PDF bytes for records assembled from cached pages; only cache misses are rendered
+    
+    cache is any object with get(key) and put(key, page_bytes).
+    """
+    keys = [page_cache_key(kind, record) for record in records]
+    pages = [cache.get(key) for key in keys]
+    missing = [i for i, page in enumerate(pages) if page is None]
+    if missing:
+        rendered = split_pdf_pages(render([records[i] for i in missing], timings=timings))
+        for i, page in zip(missing, rendered):
+            cache.put(keys[i], page)
+            pages[i] = page
+    return concat_pdfs(pages)
@@ -1,438 +1,440 @@
 import streamlit as st
-import pdfplumber
-import re
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+from contextlib import nullcontext
+from importlib.machinery import ModuleSpec
+
 import pandas as pd
-from io import BytesIO
-from reportlab.lib.pagesizes import landscape, inch
-from reportlab.pdfgen import canvas
-from reportlab.lib import colors
-from reportlab.lib.utils import simpleSplit
+
+from towel_core import (
+    DEFAULT_BACKEND,
+    DEFAULT_PARSE_WORKERS,
+    EXTRACTION_BACKENDS,
+    PARSE_MODES,
+    cache_rendered_pages,
+    changeovers,
+    export_csv,
+    export_xlsx,
+    iter_order_items,
+    gift_note_data,
+    label_records,
+    manufacturing_plan,
+    orders_to_dataframe,
+    parse_pdf_batch,
+    production_runs,
+    production_sequence,
+    render_cached,
+    render_gift_notes,
+    render_manufacturing_labels,
+    render_sharded,
+    unique_orders,
+)
+from instrumentation import RUN_LOG_PATH, StageTimings
+from job_queue import CANCELLED, DONE, FAILED, RUNNING, JobQueue, JobQueueFull
+from order_store import OrderStore
+from pdf_spool import PdfSpool, new_session_id
+
+# Streamlit runs this script as the __main__ module. Worker processes (forkserver or
+# spawn) would re-run its file to set up their own __main__; a module named __main__
+# is left alone instead
+__spec__ = ModuleSpec('__main__', None)
 
 # Page config
 st.set_page_config(page_title="Towel Order Parser", layout="wide", page_icon="🧺")
 
-# Initialize session state
-if 'mfg_labels_pdf' not in st.session_state:
-    st.session_state['mfg_labels_pdf'] = None
-if 'gift_notes_pdf' not in st.session_state:
-    st.session_state['gift_notes_pdf'] = None
-
-# Color translations (English to Spanish)
-COLOR_TRANSLATIONS = {
-    'WHITE': 'Blanco',
-    'BLACK': 'Negro',
-    'NAVY': 'Azul Marino',
-    'NAVY BLUE': 'Azul Marino',
-    'GOLD': 'Oro',
-    'SILVER': 'Plata',
-    'RED': 'Rojo',
-    'BLUE': 'Azul',
-    'MID BLUE': 'Azul Medio',
-    'LIGHT BLUE': 'Azul Claro',
-    'DARK BLUE': 'Azul Oscuro',
-    'GREEN': 'Verde',
-    'LIGHT GREEN': 'Verde Claro',
-    'DARK GREEN': 'Verde Oscuro',
-    'GREY': 'Gris',
-    'GRAY': 'Gris',
-    'LIGHT GREY': 'Gris Claro',
-    'LIGHT GRAY': 'Gris Claro',
-    'DARK GREY': 'Gris Oscuro',
-    'DARK GRAY': 'Gris Oscuro',
-    'BROWN': 'Marrón',
-    'PINK': 'Rosa',
-    'LIGHT PINK': 'Rosa Claro',
-    'HOT PINK': 'Rosa Fuerte',
-    'PURPLE': 'Morado',
-    'YELLOW': 'Amarillo',
-    'ORANGE': 'Naranja',
-    'CREAM': 'Crema',
-    'BEIGE': 'Beige',
-    'TAN': 'Bronceado',
-    'BURGUNDY': 'Burdeos',
-    'MAROON': 'Granate'
-}
+# Initialize session state: generated PDFs live in the spool and background jobs in the
+# shared job queue; the session only keeps its id and references to them
+if 'session_id' not in st.session_state:
+    st.session_state['session_id'] = new_session_id()
 
-def get_spanish_color(english_color):
-    """Get Spanish translation of color name"""
-    color_upper = english_color.upper().strip()
-    return COLOR_TRANSLATIONS.get(color_upper, english_color)
+# Parsed results kept per PDF content hash (least recently used evicted first)
+PARSE_CACHE_MAX_ENTRIES = 64
 
-def parse_towel_orders(pdf_file):
-    """Parse Amazon towel order PDFs"""
-    orders = []
-    
-    with pdfplumber.open(pdf_file) as pdf:
-        current_order = None
-        
-        for page in pdf.pages:
-            text = page.extract_text()
-            
-            # Check if this is a new order (has "Order ID:")
-            if 'Order ID:' in text:
-                # Save previous order if exists
-                if current_order and current_order['items']:
-                    orders.append(current_order)
-                
-                # Start new order
-                order_id_match = re.search(r'Order ID:\s*([\d-]+)', text)
-                current_order = {
-                    'order_id': order_id_match.group(1).strip() if order_id_match else '',
-                    'order_date': '',
-                    'buyer_name': '',
-                    'shipping_service': '',
-                    'items': []
-                }
-                
-                # Extract metadata
-                date_match = re.search(r'Order Date:\s*(.+?)(?:\n|Shipping)', text)
-                if date_match:
-                    current_order['order_date'] = date_match.group(1).strip()
-                
-                shipping_match = re.search(r'Shipping Service:\s*(.+?)(?:\n|Buyer)', text)
-                if shipping_match:
-                    current_order['shipping_service'] = shipping_match.group(1).strip()
-                
-                # Get buyer name from Ship To section
-                ship_to_match = re.search(r'Ship To:\s*\n\s*(.+?)(?:\n)', text)
-                if ship_to_match:
-                    current_order['buyer_name'] = ship_to_match.group(1).strip()
-            
-            if current_order:
-                # Extract line items
-                sections = re.split(r'(SKU:\s*[^\n]+)', text)
-                
-                for i in range(1, len(sections), 2):
-                    if i + 1 < len(sections):
-                        sku_line = sections[i]
-                        content = sections[i + 1]
-                        
-                        sku_match = re.search(r'SKU:\s*([^\n]+)', sku_line)
-                        if not sku_match:
-                            continue
-                        
-                        sku = sku_match.group(1).strip()
-                        
-                        # Find quantity
-                        qty_match = re.search(r'Quantity[^\d]*(\d+)', text[:text.find(sku_line)])
-                        quantity = qty_match.group(1) if qty_match else '1'
-                        
-                        # Extract customizations
-                        font_match = re.search(r'Choose Your Font:\s*(.+?)(?:\n|Font Color)', content)
-                        font = font_match.group(1).strip() if font_match else ''
-                        
-                        color_match = re.search(r'Font Color:\s*([^(#\n]+)', content)
-                        font_color = color_match.group(1).strip() if color_match else ''
-                        
-                        # Parse SKU for product type and color
-                        towel_color = sku.split('-')[-1].strip()
-                        # Clean up color - remove any tax/price text that got captured
-                        towel_color = re.split(r'\s+(?:Tax|Item|total|\$)', towel_color)[0].strip()
-                        
-                        customizations = []
-                        product_type = ''
-                        
-                        if 'Set-6Pcs' in sku:
-                            product_type = '6-pc Set'
-                            fields = [
-                                ('Washcloth 1', r'First Washcloth:\s*(.+?)(?:\n|Second)'),
-                                ('Washcloth 2', r'Second Washcloth:\s*(.+?)(?:\n|First Hand)'),
-                                ('Hand Towel 1', r'First Hand Towel:\s*(.+?)(?:\n|Second Hand)'),
-                                ('Hand Towel 2', r'Second Hand Towel:\s*(.+?)(?:\n|First Bath)'),
-                                ('Bath Towel 1', r'First Bath Towel:\s*(.+?)(?:\n|Second Bath)'),
-                                ('Bath Towel 2', r'Second Bath Towel:\s*(.+?)(?:\n|Item|Grand|$)')
-                            ]
-                        elif 'Set-3Pcs' in sku:
-                            product_type = '3-pc Set'
-                            fields = [
-                                ('Washcloth', r'Washcloth:\s*(.+?)(?:\n|Hand Towel)'),
-                                ('Hand Towel', r'Hand Towel:\s*(.+?)(?:\n|Bath Towel)'),
-                                ('Bath Towel', r'Bath Towel:\s*(.+?)(?:\n|Item|Grand|Gift|Add|$)')
-                            ]
-                        elif 'HT-2' in sku or 'HT-2PCS' in sku or 'HT-2Pcs' in sku:
-                            product_type = '2-pc Hand Towel'
-                            fields = [
-                                ('Hand Towel 1', r'First Hand Towel:\s*(.+?)(?:\n|Second)'),
-                                ('Hand Towel 2', r'Second Hand Towel:\s*(.+?)(?:\n|Item|Grand|$)')
-                            ]
-                        elif 'BT-2' in sku or 'BT-2Pcs' in sku:
-                            product_type = '2-pc Bath Towel'
-                            fields = [
-                                ('Bath Towel 1', r'First Bath Towel:\s*(.+?)(?:\n|Second)'),
-                                ('Bath Towel 2', r'Second Bath Towel:\s*(.+?)(?:\n|Item|Grand|$)')
-                            ]
-                        elif 'BS-1' in sku or 'BS-1Pcs' in sku:
-                            product_type = 'Bath Sheet (Oversized)'
-                            fields = [
-                                ('Bath Sheet', r'Oversized Bath Sheet:\s*(.+?)(?:\n|Item|Grand|$)')
-                            ]
-                        else:
-                            # Check for monogrammed hand towels
-                            if 'Monogrammed Hand Towels' in text:
-                                product_type = '2-pc Hand Towel (Monogrammed)'
-                                initial_match = re.search(r'-\s*([A-Z])\s*$', sku)
-                                if initial_match:
-                                    initial = initial_match.group(1)
-                                    customizations = [('Hand Towel 1', initial), ('Hand Towel 2', initial)]
-                                    fields = None
-                            else:
-                                product_type = 'Unknown'
-                                fields = None
-                        
-                        # Extract customization texts if fields defined
-                        if 'fields' in locals() and fields:
-                            for label, pattern in fields:
-                                match = re.search(pattern, content)
-                                if match:
-                                    text_val = match.group(1).strip()
-                                    customizations.append((label, text_val))
-                        
-                        # Check for gift message
-                        gift_msg_match = re.search(r'Gift Message:\s*(.+?)(?:\n|Item|Grand|$)', content)
-                        gift_message = gift_msg_match.group(1).strip() if gift_msg_match else ''
-                        
-                        # Check for gift card
-                        gift_card_match = re.search(r'Add Gift Card:\s*(.+?)(?:\n|Item|Grand|$)', content)
-                        if gift_card_match and not gift_message:
-                            gift_message = gift_card_match.group(1).strip()
-                        
-                        item = {
-                            'sku': sku,
-                            'product_type': product_type,
-                            'towel_color': towel_color,
-                            'quantity': quantity,
-                            'font': font,
-                            'font_color': font_color,
-                            'customizations': customizations,
-                            'gift_message': gift_message
-                        }
-                        current_order['items'].append(item)
-        
-        if current_order and current_order['items']:
-            orders.append(current_order)
-    
-    return orders
+class ParseCache:
+    """Size-bounded LRU cache of parsed orders keyed by PDF content hash"""
+    
+    def __init__(self, max_entries=PARSE_CACHE_MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, content_hash):
+        with self._lock:
+            orders = self._entries.get(content_hash)
+            if orders is not None:
+                self._entries.move_to_end(content_hash)
+            return orders
+    
+    def put(self, content_hash, orders):
+        with self._lock:
+            self._entries[content_hash] = orders
+            self._entries.move_to_end(content_hash)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
 
-def generate_manufacturing_label(c, data, is_first=True):
-    """Generate two-column manufacturing label"""
-    W, H = landscape((4 * inch, 6 * inch))
-    left = 0.25 * inch
-    right = W - 0.25 * inch
-    
-    if is_first:
-        y = H - 0.25 * inch
-    else:
-        y = H - 0.25 * inch
-    
-    # ============ HEADER: BUYER NAME & ORDER INFO ============
-    # Buyer name (bold, 13pt)
-    c.setFont("Helvetica-Bold", 13)
-    c.drawString(left, y, data['buyer'])
+@st.cache_resource
+def get_parse_cache():
+    """Process-wide parse cache shared by all sessions and reruns"""
+    return ParseCache()
+
+# Rendered single-page label PDFs kept for assembling selections (total size bound)
+PAGE_CACHE_MAX_BYTES = 64 * 1024 * 1024
+
+class PageCache:
+    """LRU cache of rendered single-page PDFs, bounded by their total size in bytes"""
+    
+    def __init__(self, max_bytes=PAGE_CACHE_MAX_BYTES):
+        self.max_bytes = max_bytes
+        self.total_bytes = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+    
+    def get(self, key):
+        with self._lock:
+            page = self._entries.get(key)
+            if page is not None:
+                self._entries.move_to_end(key)
+            return page
+    
+    def put(self, key, page):
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self.total_bytes -= len(previous)
+            self._entries[key] = page
+            self.total_bytes += len(page)
+            while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+                _, evicted = self._entries.popitem(last=False)
+                self.total_bytes -= len(evicted)
+
+@st.cache_resource
+def get_page_cache():
+    """Process-wide cache of rendered label and gift note pages"""
+    return PageCache()
+
+@st.cache_resource
+def get_pdf_spool():
+    """Process-wide spool directory of generated PDFs"""
+    return PdfSpool()
+
+# Spool "session" holding the PDFs rendered by background jobs, which sessions share
+JOB_SPOOL_SESSION = 'jobs'
+
+def partial_spool_name(job_id):
+    """Spool name of the PDF with the pages a render job has finished so far"""
+    return f"{job_id}_partial"
+
+def spooled_download_button(name, file_name, key, label="📥 Download PDF"):
+    """Download button serving a job's spooled PDF from its file; False (and no button) if there is none"""
+    path = get_pdf_spool().path(JOB_SPOOL_SESSION, name)
+    if path is None:
+        return False
+    try:
+        with open(path, 'rb') as f:
+            st.download_button(label, f, file_name, "application/pdf",
+                               use_container_width=True, key=key)
+    except FileNotFoundError:
+        return False  # evicted between lookup and download
+    return True
+
+def has_spooled_pdf(job):
+    """Whether a done render job's PDF is still in the spool"""
+    return get_pdf_spool().path(JOB_SPOOL_SESSION, job.id) is not None
+
+@st.cache_resource
+def get_job_queue():
+    """Process-wide queue of parse and render jobs shared by all sessions"""
+    return JobQueue()
+
+# Seconds between status checks of a running background job
+JOB_POLL_SECONDS = 1.0
+
+@st.fragment(run_every=JOB_POLL_SECONDS)
+def job_progress(job_id, label):
+    """Progress bar and cancel button of a running job; reruns the app once it has finished"""
+    job = get_job_queue().get(job_id)
+    if job is None or job.finished:
+        st.rerun()
+    status = job.message if job.status == RUNNING else "waiting for a free worker"
+    st.progress(job.fraction, text=f"{label}... {status}")
+    if st.button("✖ Cancel", key=f"cancel_{job_id}"):
+        get_job_queue().cancel(job_id, st.session_state['session_id'])
+        st.session_state.setdefault('cancelled_jobs', set()).add(job_id)
+        st.rerun()
+
+def submit_job(key, fn, *args, reusable=None):
+    """Submit a job to the shared queue for this session; None (with a warning) when the queue is full"""
+    try:
+        job = get_job_queue().submit(key, fn, *args, watcher=st.session_state['session_id'], reusable=reusable)
+    except JobQueueFull:
+        st.warning("⏳ The server is busy with other uploads. Please try again in a moment.")
+        return None
+    st.session_state.setdefault('cancelled_jobs', set()).discard(job.id)
+    if not job.finished:
+        st.session_state.setdefault('collected_jobs', set()).discard(job.id)
+    return job
+
+def parse_job(job, pdf_blobs, workers, mode, backend):
+    """Job: parse uploads with progress; returns (list of (orders, error), StageTimings)"""
+    timings = StageTimings()
     
-    # QTY and Item Counter Badge
-    qty_value = int(data['quantity'])
+    def progress(pages_done, page_count, orders_done):
+        job.report(pages_done, page_count, f"page {pages_done} of {page_count} · {orders_done} orders")
     
-    # Show item counter badge only if order has multiple items
-    if data['item_count'] > 1:
-        # QTY label
-        if qty_value > 2:
-            c.setFont("Helvetica-BoldOblique", 15)
-        else:
-            c.setFont("Helvetica-Bold", 15)
-        qty_text = f"QTY: {data['quantity']}"
-        qty_width = c.stringWidth(qty_text, c._fontname, c._fontsize)
-        c.drawRightString(right - 0.85 * inch, y, qty_text)
-        
-        # Item counter badge with warning triangle [2 of 3]
-        c.setFont("Helvetica-Bold", 11)
-        badge_text = f"▲ [{data['item_number']} of {data['item_count']}]"
-        c.drawRightString(right, y, badge_text)
+    results = parse_pdf_batch(pdf_blobs, workers=workers, mode=mode, backend=backend, progress=progress, timings=timings)
+    return results, timings
+
+def render_job(job, render, items, workers, kind, page_cache, spool, order_store, keys):
+    """Job: render a label or gift note PDF into the spool and mark its items printed; returns StageTimings
+    
+    While it runs, the pages finished so far are spooled as a partial PDF
+    and job.partial is their count.
+    """
+    timings = StageTimings()
+    
+    def progress(done, total):
+        job.report(done, total, f"{done} of {total} labels" + (f" · first {job.partial} ready" if job.partial else ""))
+    
+    def publish_partial(pdf_bytes, count):
+        spool.write(JOB_SPOOL_SESSION, partial_spool_name(job.id), pdf_bytes)
+        job.partial = count
+    
+    pdf_bytes = render_sharded(render, items, workers, timings, progress, publish_partial)
+    cache_rendered_pages(pdf_bytes, items, page_cache, kind)
+    spool.write(JOB_SPOOL_SESSION, job.id, pdf_bytes)
+    job.partial = None
+    spool.remove(JOB_SPOOL_SESSION, partial_spool_name(job.id))
+    order_store.mark_printed(keys, kind)
+    return timings
+
+def partial_download_button(job_id, count, file_name):
+    """Download of the first count pages of a render job that is still running or was cancelled"""
+    spooled_download_button(partial_spool_name(job_id), f"first_{count}_{file_name}", f"download_partial_{job_id}_{count}",
+                            f"📥 Download first {count}")
+
+def prepare_partial_download(job, noun, file_name):
+    """Button offering the pages a running render job has finished so far
+    
+    Outside the polling job_progress fragment, and the partial PDF is only
+    read once asked for, so it is not loaded into memory every poll.
+    """
+    if not st.button(f"📦 Prepare {noun} finished so far", key=f"prepare_partial_{job.id}"):
+        return
+    if job.partial:
+        partial_download_button(job.id, job.partial, file_name)
     else:
-        # Single item - just show QTY
-        if qty_value > 2:
-            c.setFont("Helvetica-BoldOblique", 15)
+        st.caption(f"No {noun} are finished yet")
+
+def records_key(kind, records):
+    """Content hash of the records a render job prints"""
+    return content_hash(json.dumps([kind, records], sort_keys=True, default=str).encode('utf-8'))
+
+def render_job_status(state_key, noun, file_name, download_key, timings):
+    """Progress of this session's render job of noun (e.g. "gift notes"), then its download button
+    
+    The first time a session sees its job done, the job's stage timings are
+    added to this run's.
+    """
+    job_id = st.session_state.get(state_key)
+    if job_id is None:
+        return
+    job = get_job_queue().get(job_id)
+    # A job this session cancelled keeps running while other sessions wait for it
+    if job_id in st.session_state.get('cancelled_jobs', ()) or (job is not None and job.status == CANCELLED):
+        st.info(f"Generating {noun} was cancelled")
+        if job is not None and job.partial:
+            partial_download_button(job_id, job.partial, file_name)
+        if job is not None and not job.cancelled:
+            st.caption(f"Other sessions are still waiting for these {noun}: the job keeps running for them "
+                       f"and marks them printed when it finishes")
+        elif job is not None and job.partial:
+            st.caption(f"{noun.capitalize()} of a cancelled run are not marked printed")
+        return
+    if job is not None and not job.finished:
+        job_progress(job_id, f"Generating {noun}")
+        prepare_partial_download(job, noun, file_name)
+        return
+    if job is not None and job.status == FAILED:
+        st.error(f"Generating {noun} failed: {job.error}")
+        return
+    collected = st.session_state.setdefault('collected_jobs', set())
+    if job is not None and job.id not in collected:
+        collected.add(job.id)
+        timings.merge(job.result)
+        st.success(f"✅ Generated {job.total} {noun}")
+    if not spooled_download_button(job_id, file_name, download_key):
+        st.info(f"The generated {noun} PDF has expired. Generate it again to download it.")
+
+@st.cache_resource
+def get_order_store():
+    """Process-wide handle on the local SQLite order store"""
+    return OrderStore()
+
+def item_keys(rows):
+    """(Order ID, item position) store keys for a frame of line items"""
+    return [(order_id, int(number)) for order_id, number in zip(rows['Order ID'], rows['item_number'])]
+
+@st.cache_data(max_entries=16)
+def get_manufacturing_plan(dataset_key, _df):
+    """Manufacturing plan memoized per parsed upload set (dataset_key)"""
+    return manufacturing_plan(_df)
+
+@st.cache_data(max_entries=8)
+def get_csv_export(export_version, _df, _timings=None):
+    """CSV export memoized per dataset version"""
+    with _timings.stage('export_csv') if _timings is not None else nullcontext():
+        return export_csv(_df)
+
+@st.cache_data(max_entries=8)
+def get_xlsx_export(export_version, include_plan, _df, _plan, _timings=None):
+    """Excel export memoized per dataset version and sheet selection"""
+    with _timings.stage('export_xlsx') if _timings is not None else nullcontext():
+        return export_xlsx(_df, _plan if include_plan else None)
+
+@st.cache_data(max_entries=16)
+def get_production_sequence(dataset_key, _df, _thread_order):
+    """Production sequence of all parsed items, memoized per parsed upload set"""
+    return production_sequence(_df, _thread_order)
+
+def row_records(records, rows):
+    """Label records for rows of the order table (its index starts at 1)"""
+    return [records[idx - 1] for idx in rows.index]
+
+# Label print orders offered in the sidebar
+LABEL_ORDERS = {
+    'upload': 'Upload order',
+    'production': 'Production sequence',
+}
+
+def in_print_order(rows, label_order, thread_order):
+    """rows in the chosen label print order"""
+    if label_order == 'production':
+        return rows.loc[production_sequence(rows, thread_order)]
+    return rows
+
+def changeover_note(rows, sequenced_rows):
+    """Estimated changeovers of rows in upload order vs. production sequence"""
+    before, after = changeovers(rows), changeovers(sequenced_rows)
+    return (f"🔀 Production sequence: {after['thread']} thread and {after['blank']} blank changeovers "
+            f"(upload order: {before['thread']} and {before['blank']})")
+
+# Rows per page offered by the label and gift note selection tables
+SELECTION_PAGE_SIZES = (25, 50, 100, 250)
+
+def filter_rows(rows, key):
+    """Filter widgets (thread color, towel color, product type, order ID); returns (rows, filters)"""
+    col1, col2, col3, col4 = st.columns(4)
+    threads = col1.multiselect("Thread color", sorted(rows['Thread Color'].unique()), key=f"{key}_thread")
+    colors = col2.multiselect("Towel color", sorted(rows['Color'].unique()), key=f"{key}_color")
+    products = col3.multiselect("Product type", sorted(rows['Product Type'].unique()), key=f"{key}_product")
+    order_id = col4.text_input("Order ID contains", key=f"{key}_order").strip()
+    
+    mask = pd.Series(True, index=rows.index)
+    if threads:
+        mask &= rows['Thread Color'].isin(threads)
+    if colors:
+        mask &= rows['Color'].isin(colors)
+    if products:
+        mask &= rows['Product Type'].isin(products)
+    if order_id:
+        mask &= rows['Order ID'].str.contains(order_id, regex=False)
+    return rows[mask], (threads, colors, products, order_id)
+
+def selection_table(rows, key, columns):
+    """Filterable, paginated selection over rows in one table editor
+    
+    Only the current page is sent to the browser. The selection is kept in
+    st.session_state[key] as a set of table indices, so it survives paging
+    and filtering. Returns the selected indices in table order.
+    """
+    selected = st.session_state.setdefault(key, set())
+    version_key = f"{key}_version"
+    st.session_state.setdefault(version_key, 0)
+    filtered, filters = filter_rows(rows, key)
+    
+    col1, col2, col3, col4 = st.columns(4)
+    page_size = col1.selectbox("Rows per page", SELECTION_PAGE_SIZES, key=f"{key}_page_size")
+    page_count = max(1, -(-len(filtered) // page_size))
+    page_key = f"{key}_page"
+    if st.session_state.get(page_key, 1) > page_count:
+        st.session_state[page_key] = page_count
+    page = col2.number_input(f"Page (of {page_count})", min_value=1, max_value=page_count, key=page_key)
+    if col3.button(f"Select all in filter ({len(filtered)})", key=f"{key}_select_all", use_container_width=True):
+        selected.update(filtered.index)
+        st.session_state[version_key] += 1
+    if col4.button("Clear selection", key=f"{key}_clear", use_container_width=True):
+        selected.clear()
+        st.session_state[version_key] += 1
+    
+    page_rows = filtered.iloc[(page - 1) * page_size:page * page_size]
+    table = page_rows[columns].copy()
+    table.insert(0, 'Select', page_rows.index.isin(list(selected)))
+    
+    # A new editor (and edit state) for every page, filter and bulk selection change
+    view = repr((filters, page, page_size, st.session_state[version_key]))
+    edited = st.data_editor(
+        table,
+        key=f"{key}_editor_{hashlib.md5(view.encode('utf-8')).hexdigest()[:12]}",
+        disabled=columns,
+        use_container_width=True
+    )
+    for idx, is_selected in edited['Select'].items():
+        if is_selected:
+            selected.add(idx)
         else:
-            c.setFont("Helvetica-Bold", 15)
-        c.drawRightString(right, y, f"QTY: {data['quantity']}")
-    
-    y -= 0.16 * inch
-    
-    # Order ID (regular, 11pt)
-    c.setFont("Helvetica", 11)
-    c.drawString(left, y, f"Order: {data['order_id']}")
-    
-    # Shipping
-    c.setFont("Helvetica", 9)
-    c.drawRightString(right, y, data['shipping'])
-    y -= 0.15 * inch
-    
-    # Date
-    c.setFont("Helvetica", 9)
-    c.drawString(left, y, data['date'])
-    y -= 0.22 * inch
-    
-    # Thick divider
-    c.setStrokeColor(colors.black)
-    c.setLineWidth(2)
-    c.line(left, y, right, y)
-    y -= 0.15 * inch
-    
-    # ============ TWO-COLUMN SECTION ============
-    total_width = right - left
-    left_col_width = total_width * 0.40
-    right_col_width = total_width * 0.60
-    
-    left_col_right = left + left_col_width
-    right_col_left = left_col_right + 0.1 * inch
-    
-    content_height = 2.4 * inch
-    content_top = y
-    content_bottom = y - content_height
-    
-    # Outer border
-    c.setLineWidth(2)
-    c.rect(left, content_bottom, right - left, content_height, stroke=1, fill=0)
-    
-    # Vertical divider
-    c.setLineWidth(1.5)
-    c.line(left_col_right + 0.05 * inch, content_top, 
-           left_col_right + 0.05 * inch, content_bottom)
-    
-    # ========== LEFT COLUMN: PRODUCT SPECS ==========
-    col_y = content_top - 0.12 * inch
-    col_center = left + (left_col_width / 2)
+            selected.discard(idx)
     
-    # Product Type (label + value with spacing)
-    c.setFont("Helvetica", 8)
-    c.drawCentredString(col_center, col_y, "PRODUCT TYPE:")
-    col_y -= 0.24 * inch  # Increased spacing (was 0.2)
-    c.setFont("Helvetica-Bold", 13)  # Enlarged by 2pts (was 11pt)
-    c.drawCentredString(col_center, col_y, data['product_type'].upper())
-    col_y -= 0.32 * inch  # More space before divider (was 0.3)
-    
-    # Divider
-    c.setLineWidth(0.5)
-    c.line(left + 0.05 * inch, col_y, left_col_right - 0.05 * inch, col_y)
-    col_y -= 0.24 * inch  # More space after divider (was 0.22, moved down)
-    
-    # Color (ALL CAPS, centered, BOLD) - moved down
-    c.setFont("Helvetica", 8)
-    c.drawCentredString(col_center, col_y, "COLOR:")
-    col_y -= 0.22 * inch  # Increased spacing (was 0.2)
-    c.setFont("Helvetica-Bold", 16)  # Made BOLD
-    c.drawCentredString(col_center, col_y, data['towel_color'].upper())
-    col_y -= 0.34 * inch  # More space before divider (was 0.32)
-    
-    # Divider
-    c.setLineWidth(0.5)
-    c.line(left + 0.05 * inch, col_y, left_col_right - 0.05 * inch, col_y)
-    col_y -= 0.24 * inch  # More space after divider (was 0.22, moved down)
-    
-    # Thread Color (centered, BOLD) - moved down, enlarged, with Spanish
-    c.setFont("Helvetica", 8)
-    c.drawCentredString(col_center, col_y, "THREAD COLOR:")
-    col_y -= 0.2 * inch  # Increased spacing (was 0.18)
-    
-    # English thread color - enlarged by 2pts (was 13pt)
-    c.setFont("Helvetica-Bold", 15)
-    c.drawCentredString(col_center, col_y, data['thread_color'].upper())
-    col_y -= 0.14 * inch  # Small space before Spanish translation
-    
-    # Spanish thread color translation
-    spanish_color = get_spanish_color(data['thread_color'])
-    c.setFont("Helvetica", 10)  # Smaller for Spanish translation
-    c.drawCentredString(col_center, col_y, spanish_color)
-    
-    # ========== RIGHT COLUMN: PERSONALIZATION ==========
-    col_y = content_top - 0.12 * inch
-    
-    c.setFont("Helvetica-Bold", 9)
-    c.drawString(right_col_left + 0.05 * inch, col_y, "PERSONALIZATION:")
-    col_y -= 0.24 * inch  # More space after header
-    
-    for i, (label, text) in enumerate(data['customizations']):
-        if col_y > content_bottom + 0.2 * inch:
-            # Label (11pt, regular font)
-            c.setFont("Helvetica", 11)
-            c.drawString(right_col_left + 0.08 * inch, col_y, f"{label}:")
-            col_y -= 0.18 * inch  # More space between label and text
-            
-            # Personalization text (15pt, bold italic)
-            c.setFont("Helvetica-BoldOblique", 15)
-            c.drawString(right_col_left + 0.08 * inch, col_y, text)
-            col_y -= 0.24 * inch  # More space between items
-    
-    # ============ BOTTOM: GIFT MESSAGE BOX ============
-    y_bottom = content_bottom - 0.15 * inch
-    
-    if data['has_gift_note']:
-        gift_box_height = 0.25 * inch
-        c.setLineWidth(2)
-        c.rect(left, y_bottom - gift_box_height, right - left, gift_box_height, stroke=1, fill=0)
-        c.setFont("Helvetica-Bold", 10)
-        c.drawString(left + 0.1 * inch, y_bottom - 0.16 * inch, "🎁 GIFT NOTE: YES")
-
-def generate_gift_note(c, order_id, buyer_name, gift_message):
-    """Generate elegant gift note label"""
-    W, H = landscape((4 * inch, 6 * inch))
-    
-    # Decorative border
-    margin = 0.4 * inch
-    c.setStrokeColor(colors.HexColor('#8B4513'))
-    c.setLineWidth(3)
-    c.rect(margin, margin, W - 2*margin, H - 2*margin, stroke=1, fill=0)
-    
-    # Inner border
-    c.setLineWidth(1)
-    c.rect(margin + 0.1*inch, margin + 0.1*inch, 
-           W - 2*margin - 0.2*inch, H - 2*margin - 0.2*inch, 
-           stroke=1, fill=0)
-    
-    # Decorative corners
-    corners = [
-        (margin + 0.15*inch, H - margin - 0.15*inch),
-        (W - margin - 0.15*inch, H - margin - 0.15*inch),
-        (margin + 0.15*inch, margin + 0.15*inch),
-        (W - margin - 0.15*inch, margin + 0.15*inch)
-    ]
-    
-    c.setFont("Helvetica", 16)
-    c.setFillColor(colors.HexColor('#D4A574'))
-    for x, y in corners:
-        c.drawCentredString(x, y - 0.05*inch, "❀")
-    
-    # Heart at top
-    c.setFont("Helvetica", 20)
-    c.setFillColor(colors.HexColor('#C64A7B'))
-    c.drawCentredString(W / 2, H - margin - 0.5*inch, "♥")
-    
-    # Gift message (centered, wrapped)
-    y = H / 2 + 0.3 * inch
-    c.setFont("Helvetica-Oblique", 14)
-    c.setFillColor(colors.HexColor('#4A4A4A'))
-    
-    max_width = W - 2*margin - 0.8*inch
-    lines = simpleSplit(gift_message, "Helvetica-Oblique", 14, max_width)
-    
-    for line in lines:
-        c.drawCentredString(W / 2, y, line)
-        y -= 0.22 * inch
-    
-    # Recipient name at bottom
-    c.setFont("Helvetica-Bold", 12)
-    c.setFillColor(colors.HexColor('#8B4513'))
-    c.drawCentredString(W / 2, margin + 0.6*inch, f"To: {buyer_name}")
-    
-    # Order reference
-    c.setFont("Helvetica", 7)
-    c.setFillColor(colors.grey)
-    c.drawRightString(W - margin - 0.15*inch, margin + 0.2*inch, f"Order: {order_id}")
+    st.caption(f"{len(selected)} selected · showing {len(page_rows)} of {len(filtered)} matching items")
+    return sorted(selected)
+
+def content_hash(pdf_bytes):
+    """SHA-256 hex digest of an uploaded PDF's bytes"""
+    return hashlib.sha256(pdf_bytes).hexdigest()
 
 # ==================== STREAMLIT APP ====================
 
 st.title("🧺 Towel Order Parser & Label Generator")
 st.markdown("**Upload Amazon packing slip PDFs to generate manufacturing labels**")
 
+# Sidebar settings
+with st.sidebar:
+    st.header("⚙️ Settings")
+    parse_workers = st.number_input(
+        "Worker processes",
+        min_value=1,
+        max_value=max(os.cpu_count() or 1, 1),
+        value=DEFAULT_PARSE_WORKERS,
+        help="Uploads are parsed, and large label PDFs rendered, in parallel worker processes. Small batches run serially."
+    )
+    parse_mode = st.selectbox(
+        "Parallel parsing mode",
+        PARSE_MODES,
+        format_func=lambda m: {'auto': 'Auto', 'files': 'One file per worker', 'pages': 'Split pages across workers'}[m],
+        help="Auto splits a single large PDF into page ranges and otherwise parses one file per worker."
+    )
+    extraction_backend = st.selectbox(
+        "Text extraction backend",
+        list(EXTRACTION_BACKENDS),
+        index=list(EXTRACTION_BACKENDS).index(DEFAULT_BACKEND),
+        format_func=lambda b: {'layout': 'pdfplumber layout (reference)', 'chars': 'pdfplumber raw characters', 'pdfminer': 'pdfminer.six',
+                               'pdfium': 'pypdfium2 page text'}[b],
+        help="Faster backends skip parts of pdfplumber's layout analysis. Compare them with benchmarks/bench_extraction_backends.py."
+    )
+    label_order = st.selectbox(
+        "Label print order",
+        list(LABEL_ORDERS),
+        format_func=LABEL_ORDERS.get,
+        help="Production sequence groups labels by thread and towel color to cut changeovers, keeps multi-item orders together and puts faster shipping services first."
+    )
+    diagnostics = st.expander("🩺 Diagnostics")
+
+# Stage timings of this script run; logged when it parsed, rendered or exported
+run_timings = StageTimings()
+run_info = {'backend': extraction_backend, 'workers': parse_workers, 'mode': parse_mode}
+
 # File uploader
 uploaded_files = st.file_uploader(
     "Upload PDF files", 
@@ -442,51 +444,101 @@ uploaded_files = st.file_uploader(
 )
 
 if uploaded_files:
-    # Clear previous session data when new files are uploaded
-    st.session_state['mfg_labels_pdf'] = None
-    st.session_state['gift_notes_pdf'] = None
-    
-    # Parse all files
+    uploads = [(f, f.getvalue()) for f in uploaded_files]
+    upload_hashes = [content_hash(pdf_bytes) for _, pdf_bytes in uploads]
+    
+    # Clear previous session data only when the set of uploaded files changes
+    if st.session_state.get('upload_hashes') != upload_hashes:
+        st.session_state['upload_hashes'] = upload_hashes
+        st.session_state.pop('mfg_labels_job', None)
+        st.session_state.pop('gift_notes_job', None)
+        st.session_state['mfg_selection'] = set()
+        st.session_state['gift_selection'] = set()
+    
+    # Parse all files (only uploads not seen before are actually parsed)
+    parse_cache = get_parse_cache()
+    cache_keys = [f"{extraction_backend}:{h}" for h in upload_hashes]
+    results = [(parse_cache.get(k), None) for k in cache_keys]
+    pending = [i for i, (orders, _) in enumerate(results) if orders is None]
+    
+    if pending:
+        # Parsed by a shared background job: sessions uploading the same files wait for one parse
+        parse_key = ('parse', tuple(cache_keys[i] for i in pending))
+        cancelled_jobs = st.session_state.setdefault('cancelled_jobs', set())
+        job = get_job_queue().find(parse_key)
+        if job is not None and job.id in cancelled_jobs:
+            st.info("Parsing was cancelled")
+            if st.button("🔄 Parse again"):
+                cancelled_jobs.discard(job.id)
+                st.rerun()
+            st.stop()
+        if job is not None and job.status == FAILED:
+            # Only parsed again when asked, so a failure is shown instead of retried on every rerun
+            st.error(f"Parsing failed: {job.error}")
+            if not st.button("🔄 Parse again", key='retry_failed_parse'):
+                st.stop()
+        job = submit_job(parse_key, parse_job, [uploads[i][1] for i in pending],
+                         parse_workers, parse_mode, extraction_backend)
+        if job is not None and not job.finished:
+            job_progress(job.id, "Parsing PDFs")
+        if job is None or job.status != DONE:
+            if job is not None and job.status == FAILED:
+                st.error(f"Parsing failed: {job.error}")
+            st.stop()
+        
+        parsed, parse_timings = job.result
+        run_timings.merge(parse_timings)
+        for i, (orders, error) in zip(pending, parsed):
+            if error is None:
+                parse_cache.put(cache_keys[i], orders)
+            results[i] = (orders, error)
+    
+    # Merge in upload order
     all_orders = []
+    for (uploaded_file, _), (orders, error) in zip(uploads, results):
+        if error is not None:
+            st.error(f"Error parsing {uploaded_file.name}: {error}")
+        else:
+            all_orders.extend(orders)
     
-    with st.spinner("Parsing PDFs..."):
-        for uploaded_file in uploaded_files:
-            try:
-                orders = parse_towel_orders(uploaded_file)
-                all_orders.extend(orders)
-            except Exception as e:
-                st.error(f"Error parsing {uploaded_file.name}: {e}")
+    # Orders repeated in overlapping slip files are counted once
+    parsed_count = len(all_orders)
+    all_orders = unique_orders(all_orders)
     
     if all_orders:
-        # Create flat list for display
-        records = []
-        for order in all_orders:
-            for item in order['items']:
-                records.append({
-                    'Order ID': order['order_id'],
-                    'Date': order['order_date'],
-                    'Buyer': order['buyer_name'],
-                    'Shipping': order['shipping_service'],
-                    'Product Type': item['product_type'],
-                    'Color': item['towel_color'],
-                    'Quantity': item['quantity'],
-                    'Font': item['font'],
-                    'Thread Color': item['font_color'],
-                    'Customizations': ' | '.join([f"{l}: {t}" for l, t in item['customizations']]),
-                    'Gift Message': 'YES' if item['gift_message'] else 'NO',
-                    '_order_obj': order,
-                    '_item_obj': item
-                })
+        # Label records and the flat table of line items built from them (row i is records[i - 1])
+        with run_timings.stage('build_table'):
+            records = label_records(all_orders)
+            df = orders_to_dataframe(all_orders, records)
+        run_info.update(files=len(uploads), orders=len(all_orders), items=len(df))
         
-        df = pd.DataFrame(records)
-        # Reset index to start from 1 instead of 0
-        df.index = range(1, len(df) + 1)
+        # Record items in the order store once per upload set, then look up what was already printed
+        order_store = get_order_store()
+        if st.session_state.get('stored_uploads') != cache_keys:
+            order_store.upsert_items((order, item, number) for order, item, number, _ in iter_order_items(all_orders))
+            st.session_state['stored_uploads'] = cache_keys
+        print_status = order_store.print_status(df['Order ID'])
+        statuses = [print_status.get(key, {}) for key in item_keys(df)]
+        df['Label Printed'] = ['YES' if status.get('label') else 'NO' for status in statuses]
+        df['Gift Note Printed'] = ['YES' if status.get('gift_note') else 'NO' for status in statuses]
         
-        # Add item counter for multi-item orders
-        df['item_count'] = df.groupby('Order ID')['Order ID'].transform('count')
-        df['item_number'] = df.groupby('Order ID').cumcount() + 1
+        # Exports change whenever the upload set or a print status changes
+        export_version = (tuple(cache_keys), content_hash(''.join(df['Label Printed'] + df['Gift Note Printed']).encode('utf-8')))
         
         st.success(f"✅ Parsed {len(all_orders)} orders with {len(df)} items")
+        if parsed_count > len(all_orders):
+            st.info(f"🔁 Skipped {parsed_count - len(all_orders)} orders repeated in more than one upload")
+        already_printed = int((df['Label Printed'] == 'YES').sum())
+        if already_printed:
+            st.info(f"♻️ {already_printed} of {len(df)} items already have printed labels from earlier uploads")
+        include_printed = st.checkbox(
+            "Include already-printed items",
+            value=False,
+            help="By default only items without a printed label (or gift note) are generated"
+        )
+        
+        # Thread colors by embroidery volume; the production sequence prefers them in this order
+        thread_order = get_manufacturing_plan(tuple(cache_keys), df)['thread_summary'].index
         
         # Create tabs
         tab1, tab2, tab3, tab4 = st.tabs(["📊 Table View", "📋 Manufacturing Plan", "🏷️ Manufacturing Labels", "🎁 Gift Notes"])
@@ -495,103 +547,76 @@ if uploaded_files:
             st.subheader("Order Data")
             
             # Display table (no filters)
-            display_df = df.drop(columns=['_order_obj', '_item_obj'])
-            st.dataframe(display_df, use_container_width=True, height=400)
+            st.dataframe(df, use_container_width=True, height=400)
             
             # Generate ALL Manufacturing Labels button (with download button next to it)
+            unsequenced_rows = df if include_printed else df[df['Label Printed'] == 'NO']
+            label_rows = in_print_order(unsequenced_rows, label_order, thread_order)
             col1, col2 = st.columns(2)
             with col1:
-                generate_clicked = st.button("🏷️ Generate ALL Manufacturing Labels", type="primary", use_container_width=True)
+                generate_clicked = st.button(f"🏷️ Generate ALL Manufacturing Labels ({len(label_rows)} items)", type="primary",
+                                             use_container_width=True, disabled=label_rows.empty)
             
             with col2:
                 # Empty placeholder - will be filled after generation
                 download_placeholder = st.empty()
             
+            if label_order == 'production' and not label_rows.empty:
+                st.caption(changeover_note(unsequenced_rows, label_rows))
+            
             if generate_clicked:
-                with st.spinner("Generating all manufacturing labels..."):
-                    output = BytesIO()
-                    c = canvas.Canvas(output, pagesize=landscape((4 * inch, 6 * inch)))
-                    
-                    for idx, row in df.iterrows():
-                        order_obj = row['_order_obj']
-                        item_obj = row['_item_obj']
-                        
-                        label_data = {
-                            'order_id': order_obj['order_id'],
-                            'buyer': order_obj['buyer_name'],
-                            'date': order_obj['order_date'],
-                            'shipping': order_obj['shipping_service'],
-                            'quantity': item_obj['quantity'],
-                            'product_type': item_obj['product_type'],
-                            'towel_color': item_obj['towel_color'],
-                            'thread_color': item_obj['font_color'],
-                            'font': item_obj['font'],
-                            'customizations': item_obj['customizations'],
-                            'has_gift_note': bool(item_obj['gift_message']),
-                            'item_number': row['item_number'],
-                            'item_count': row['item_count']
-                        }
-                        
-                        generate_manufacturing_label(c, label_data)
-                        c.showPage()
-                    
-                    c.save()
-                    output.seek(0)
-                    
-                    # Store in session state
-                    st.session_state['mfg_labels_pdf'] = output.getvalue()
-                    st.success(f"✅ Generated {len(df)} manufacturing labels")
-                    
-                    # Show download button immediately after generation
-                    with download_placeholder:
-                        st.download_button(
-                            "📥 Download PDF",
-                            st.session_state['mfg_labels_pdf'],
-                            "all_manufacturing_labels.pdf",
-                            "application/pdf",
-                            use_container_width=True,
-                            key="download_mfg_after_gen"
-                        )
-            elif 'mfg_labels_pdf' in st.session_state and st.session_state['mfg_labels_pdf']:
-                # Show download button if labels exist from this session
-                with download_placeholder:
-                    st.download_button(
-                        "📥 Download PDF",
-                        st.session_state['mfg_labels_pdf'],
-                        "all_manufacturing_labels.pdf",
-                        "application/pdf",
-                        use_container_width=True,
-                        key="download_mfg_existing"
-                    )
+                # Rendered by a shared background job into the spool; the session only keeps the job id
+                labels = row_records(records, label_rows)
+                job = submit_job(('mfg_labels', records_key('label', labels)), render_job, render_manufacturing_labels,
+                                 labels, parse_workers, 'label', get_page_cache(), get_pdf_spool(), order_store,
+                                 item_keys(label_rows), reusable=has_spooled_pdf)
+                if job is not None:
+                    st.session_state['mfg_labels_job'] = job.id
+            
+            # Progress of this session's label job, then its download button
+            with download_placeholder.container():
+                render_job_status('mfg_labels_job', "manufacturing labels", "all_manufacturing_labels.pdf",
+                                  "download_mfg_labels", run_timings)
             
             # Export buttons (side by side, below manufacturing labels)
+            # Files are only built when requested, then kept for this dataset version
+            include_plan = st.checkbox("Add Manufacturing Plan sheets to the Excel export", key='export_plan_sheets')
+            xlsx_version = (export_version, include_plan)
             col1, col2 = st.columns(2)
             with col1:
-                csv = display_df.to_csv(index=True).encode('utf-8')
-                st.download_button(
-                    "📥 Export to CSV",
-                    csv,
-                    "towel_orders.csv",
-                    "text/csv",
-                    use_container_width=True
-                )
+                if st.session_state.get('csv_export_version') != export_version:
+                    if st.button("📄 Prepare CSV export", use_container_width=True):
+                        st.session_state['csv_export_version'] = export_version
+                if st.session_state.get('csv_export_version') == export_version:
+                    st.download_button(
+                        "📥 Export to CSV",
+                        get_csv_export(export_version, df, run_timings),
+                        "towel_orders.csv",
+                        "text/csv",
+                        use_container_width=True
+                    )
             
             with col2:
-                buffer = BytesIO()
-                with pd.ExcelWriter(buffer, engine='xlsxwriter') as writer:
-                    display_df.to_excel(writer, index=True, sheet_name='Orders')
-                st.download_button(
-                    "📥 Export to Excel",
-                    buffer.getvalue(),
-                    "towel_orders.xlsx",
-                    "application/vnd.ms-excel",
-                    use_container_width=True
-                )
+                if st.session_state.get('xlsx_export_version') != xlsx_version:
+                    if st.button("📄 Prepare Excel export", use_container_width=True):
+                        st.session_state['xlsx_export_version'] = xlsx_version
+                if st.session_state.get('xlsx_export_version') == xlsx_version:
+                    plan = get_manufacturing_plan(tuple(cache_keys), df) if include_plan else None
+                    st.download_button(
+                        "📥 Export to Excel",
+                        get_xlsx_export(xlsx_version, include_plan, df, plan, run_timings),
+                        "towel_orders.xlsx",
+                        "application/vnd.ms-excel",
+                        use_container_width=True
+                    )
             
             st.markdown("---")
             
             # Generate ALL Gift Notes button (only for items with gift messages)
-            gift_items_count = len(df[df['Gift Message'] == 'YES'])
+            gift_rows = df[df['Gift Message'] == 'YES']
+            if not include_printed:
+                gift_rows = gift_rows[gift_rows['Gift Note Printed'] == 'NO']
+            gift_items_count = len(gift_rows)
             
             if gift_items_count > 0:
                 col1, col2 = st.columns(2)
@@ -603,53 +628,21 @@ if uploaded_files:
                     gift_download_placeholder = st.empty()
                 
                 if gift_generate_clicked:
-                    with st.spinner("Generating all gift notes..."):
-                        output = BytesIO()
-                        c = canvas.Canvas(output, pagesize=landscape((4 * inch, 6 * inch)))
-                        
-                        count = 0
-                        for idx, row in df.iterrows():
-                            if row['Gift Message'] == 'YES':
-                                order_obj = row['_order_obj']
-                                item_obj = row['_item_obj']
-                                
-                                generate_gift_note(
-                                    c, 
-                                    order_obj['order_id'],
-                                    order_obj['buyer_name'],
-                                    item_obj['gift_message']
-                                )
-                                c.showPage()
-                                count += 1
-                        
-                        c.save()
-                        output.seek(0)
-                        
-                        # Store in session state
-                        st.session_state['gift_notes_pdf'] = output.getvalue()
-                        st.success(f"✅ Generated {count} gift notes")
-                        
-                        # Show download button immediately after generation
-                        with gift_download_placeholder:
-                            st.download_button(
-                                "📥 Download PDF",
-                                st.session_state['gift_notes_pdf'],
-                                "all_gift_notes.pdf",
-                                "application/pdf",
-                                use_container_width=True,
-                                key="download_gift_after_gen"
-                            )
-                elif 'gift_notes_pdf' in st.session_state and st.session_state['gift_notes_pdf']:
-                    # Show download button if gift notes exist from this session
-                    with gift_download_placeholder:
-                        st.download_button(
-                            "📥 Download PDF",
-                            st.session_state['gift_notes_pdf'],
-                            "all_gift_notes.pdf",
-                            "application/pdf",
-                            use_container_width=True,
-                            key="download_gift_existing"
-                        )
+                    notes = [gift_note_data(record) for record in row_records(records, gift_rows)]
+                    job = submit_job(('gift_notes', records_key('gift_note', notes)), render_job, render_gift_notes,
+                                     notes, parse_workers, 'gift_note', get_page_cache(), get_pdf_spool(), order_store,
+                                     item_keys(gift_rows), reusable=has_spooled_pdf)
+                    if job is not None:
+                        st.session_state['gift_notes_job'] = job.id
+                
+                # Progress of this session's gift note job, then its download button
+                with gift_download_placeholder.container():
+                    render_job_status('gift_notes_job', "gift notes", "all_gift_notes.pdf",
+                                      "download_gift_notes", run_timings)
+            elif (df['Gift Message'] == 'YES').any():
+                st.info("ℹ️ All gift notes in current orders were already printed")
+                # The gift note job marks its notes printed, so its download is shown here once it has finished
+                render_job_status('gift_notes_job', "gift notes", "all_gift_notes.pdf", "download_gift_notes", run_timings)
             else:
                 st.info("ℹ️ No gift messages in current orders")
         
@@ -657,36 +650,22 @@ if uploaded_files:
             st.subheader("📋 Manufacturing Plan - Production Summary")
             st.markdown("*Daily production overview organized by thread color, towel color, and product type*")
             
-            # Convert 6-pc sets to manufacturing units (2x 3-pc sets)
-            df_mfg = df.copy()
-            
-            # Calculate manufacturing units
-            # 6-pc set = 2 washcloths + 2 hand towels + 2 bath towels (treat as 2x 3-pc for production)
-            def calc_mfg_units(row):
-                qty = int(row['Quantity'])
-                product = row['Product Type']
-                
-                if '6-pc' in product.lower():
-                    return qty * 2  # 6-pc set = 2 production units
-                else:
-                    return qty
-            
-            df_mfg['Mfg_Units'] = df_mfg.apply(calc_mfg_units, axis=1)
+            plan = get_manufacturing_plan(tuple(cache_keys), df)
+            thread_summary = plan['thread_summary']
+            color_summary = plan['color_summary']
             
             # Overall Summary
             st.markdown("### 📊 Overall Summary")
             col1, col2, col3, col4 = st.columns(4)
             
             with col1:
-                st.metric("Total Orders", len(df['Order ID'].unique()))
+                st.metric("Total Orders", plan['order_count'])
             with col2:
-                st.metric("Total Line Items", len(df))
+                st.metric("Total Line Items", plan['line_items'])
             with col3:
-                total_sets = df_mfg['Mfg_Units'].sum()
-                st.metric("Production Units", int(total_sets))
+                st.metric("Production Units", plan['production_units'])
             with col4:
-                gift_count = len(df[df['Gift Message'] == 'YES'])
-                st.metric("Gift Notes", gift_count)
+                st.metric("Gift Notes", plan['gift_notes'])
             
             st.markdown("---")
             
@@ -694,13 +673,6 @@ if uploaded_files:
             st.markdown("### 🧵 Thread Color Breakdown")
             st.markdown("*Number of towel sets to embroider in each thread color*")
             
-            thread_summary = df_mfg.groupby('Thread Color').agg({
-                'Mfg_Units': 'sum',
-                'Order ID': 'count'
-            }).rename(columns={'Mfg_Units': 'Sets to Embroider', 'Order ID': 'Line Items'})
-            thread_summary = thread_summary.sort_values('Sets to Embroider', ascending=False)
-            thread_summary['Sets to Embroider'] = thread_summary['Sets to Embroider'].astype(int)
-            
             # Display as columns for easy scanning
             thread_cols = st.columns(min(len(thread_summary), 4))
             for idx, (thread_color, row) in enumerate(thread_summary.iterrows()):
@@ -717,13 +689,6 @@ if uploaded_files:
             st.markdown("### 🎨 Towel Color Breakdown")
             st.markdown("*Number of towel sets needed in each color*")
             
-            color_summary = df_mfg.groupby('Color').agg({
-                'Mfg_Units': 'sum',
-                'Order ID': 'count'
-            }).rename(columns={'Mfg_Units': 'Sets Needed', 'Order ID': 'Line Items'})
-            color_summary = color_summary.sort_values('Sets Needed', ascending=False)
-            color_summary['Sets Needed'] = color_summary['Sets Needed'].astype(int)
-            
             # Display as columns
             color_cols = st.columns(min(len(color_summary), 4))
             for idx, (color, row) in enumerate(color_summary.iterrows()):
@@ -736,20 +701,19 @@ if uploaded_files:
             
             st.markdown("---")
             
+            # Blanks to pull, by component
+            st.markdown("### 🧺 Blanks to Pull")
+            st.markdown("*Washcloths, hand towels, bath towels and bath sheets needed in each towel color*")
+            
+            st.dataframe(plan['blanks'], use_container_width=True)
+            
+            st.markdown("---")
+            
             # Product Type Breakdown
             st.markdown("### 📦 Product Type Breakdown")
             st.markdown("*6-pc sets are counted as 2 production units (2x 3-pc sets)*")
             
-            product_summary = df_mfg.groupby('Product Type').agg({
-                'Quantity': 'sum',
-                'Mfg_Units': 'sum',
-                'Order ID': 'count'
-            }).rename(columns={'Quantity': 'Ordered Qty', 'Mfg_Units': 'Production Units', 'Order ID': 'Line Items'})
-            product_summary = product_summary.sort_values('Production Units', ascending=False)
-            product_summary['Ordered Qty'] = product_summary['Ordered Qty'].astype(int)
-            product_summary['Production Units'] = product_summary['Production Units'].astype(int)
-            
-            st.dataframe(product_summary, use_container_width=True)
+            st.dataframe(plan['product_summary'], use_container_width=True)
             
             st.markdown("---")
             
@@ -757,14 +721,26 @@ if uploaded_files:
             st.markdown("### 🎯 Color × Thread Matrix")
             st.markdown("*Production units needed for each color/thread combination*")
             
-            matrix_data = df_mfg.groupby(['Color', 'Thread Color'])['Mfg_Units'].sum().unstack(fill_value=0)
-            matrix_data = matrix_data.astype(int)
+            st.dataframe(plan['matrix'], use_container_width=True)
             
-            # Add row and column totals
-            matrix_data['TOTAL'] = matrix_data.sum(axis=1)
-            matrix_data.loc['TOTAL'] = matrix_data.sum()
+            st.markdown("---")
             
-            st.dataframe(matrix_data, use_container_width=True)
+            # Production sequence vs. upload order
+            st.markdown("### 🔀 Production Sequence")
+            st.caption("Estimated changeovers for embroidering every item in upload order vs. in production sequence "
+                       "(grouped by thread and towel color, multi-item orders kept together, faster shipping first). "
+                       "Choose the label print order in the sidebar.")
+            sequenced = df.loc[get_production_sequence(tuple(cache_keys), df, thread_order)]
+            before, after = changeovers(df), changeovers(sequenced)
+            seq_col1, seq_col2, seq_col3 = st.columns(3)
+            for column, label, key in ((seq_col1, "Thread Changeovers", 'thread'),
+                                       (seq_col2, "Blank Changeovers", 'blank'),
+                                       (seq_col3, "Total Changeovers", 'total')):
+                with column:
+                    st.metric(label, after[key], f"{after[key] - before[key]} vs. upload order", delta_color="inverse")
+            runs = production_runs(sequenced)
+            with st.expander(f"Production runs ({len(runs)})"):
+                st.dataframe(runs, use_container_width=True)
             
             st.markdown("---")
             
@@ -780,61 +756,35 @@ if uploaded_files:
                     st.checkbox(f"{thread_color} ({count} sets)", key=f"thread_check_{thread_color}")
             
             with checklist_col2:
-                st.markdown("**🎨 Towel Colors Needed:**")
+                st.markdown("**🎨 Towel Blanks Needed:**")
+                blanks = plan['blanks']
                 for color in color_summary.index:
-                    count = int(color_summary.loc[color, 'Sets Needed'])
-                    st.checkbox(f"{color} ({count} sets)", key=f"color_check_{color}")
+                    pieces = ', '.join(f"{int(count)} {component.lower()}"
+                                       for component, count in blanks.loc[color].drop('TOTAL').items() if count)
+                    st.checkbox(f"{color} ({pieces})", key=f"color_check_{color}")
         
         with tab3:
             st.subheader("Manufacturing Labels")
             st.markdown("Select specific items to generate labels (6×4 inch landscape)")
             
             # Selection
-            selected_indices = []
-            for idx, row in df.iterrows():
-                col1, col2 = st.columns([0.1, 0.9])
-                with col1:
-                    if st.checkbox("", key=f"mfg_{idx}"):
-                        selected_indices.append(idx)
-                with col2:
-                    st.write(f"**{row['Order ID']}** - {row['Product Type']} - {row['Color']} - Qty: {row['Quantity']}")
+            selected_indices = selection_table(
+                df, 'mfg_selection',
+                ['Order ID', 'Buyer', 'Product Type', 'Color', 'Thread Color', 'Quantity', 'Customizations', 'Label Printed']
+            )
             
             if selected_indices:
+                selected_rows = in_print_order(df.loc[selected_indices], label_order, thread_order)
+                if label_order == 'production':
+                    st.caption(changeover_note(df.loc[selected_indices], selected_rows))
                 if st.button("🖨️ Generate Selected Labels", type="primary"):
                     with st.spinner("Generating labels..."):
-                        output = BytesIO()
-                        c = canvas.Canvas(output, pagesize=landscape((4 * inch, 6 * inch)))
-                        
-                        for idx in selected_indices:
-                            row = df.loc[idx]
-                            order_obj = row['_order_obj']
-                            item_obj = row['_item_obj']
-                            
-                            label_data = {
-                                'order_id': order_obj['order_id'],
-                                'buyer': order_obj['buyer_name'],
-                                'date': order_obj['order_date'],
-                                'shipping': order_obj['shipping_service'],
-                                'quantity': item_obj['quantity'],
-                                'product_type': item_obj['product_type'],
-                                'towel_color': item_obj['towel_color'],
-                                'thread_color': item_obj['font_color'],
-                                'font': item_obj['font'],
-                                'customizations': item_obj['customizations'],
-                                'has_gift_note': bool(item_obj['gift_message']),
-                                'item_number': row['item_number'],
-                                'item_count': row['item_count']
-                            }
-                            
-                            generate_manufacturing_label(c, label_data)
-                            c.showPage()
-                        
-                        c.save()
-                        output.seek(0)
+                        labels = row_records(records, selected_rows)
+                        order_store.mark_printed(item_keys(selected_rows), 'label')
                         
                         st.download_button(
                             "📥 Download Manufacturing Labels PDF",
-                            output.getvalue(),
+                            render_cached(render_manufacturing_labels, labels, get_page_cache(), 'label', run_timings),
                             "manufacturing_labels.pdf",
                             "application/pdf"
                         )
@@ -851,42 +801,21 @@ if uploaded_files:
             if len(gift_items) > 0:
                 st.markdown(f"**{len(gift_items)} orders with gift messages**")
                 
-                selected_gift_indices = []
-                for idx, row in gift_items.iterrows():
-                    item_obj = row['_item_obj']
-                    col1, col2 = st.columns([0.1, 0.9])
-                    with col1:
-                        if st.checkbox("", key=f"gift_{idx}"):
-                            selected_gift_indices.append(idx)
-                    with col2:
-                        with st.expander(f"**{row['Order ID']}** - {row['Buyer']}"):
-                            st.write(f"**Message:** {item_obj['gift_message']}")
+                gift_items = gift_items.assign(Message=[records[idx - 1]['gift_message'] for idx in gift_items.index])
+                selected_gift_indices = selection_table(
+                    gift_items, 'gift_selection',
+                    ['Order ID', 'Buyer', 'Message', 'Product Type', 'Color', 'Gift Note Printed']
+                )
                 
                 if selected_gift_indices:
                     if st.button("🎁 Generate Selected Gift Notes", type="primary"):
                         with st.spinner("Generating gift notes..."):
-                            output = BytesIO()
-                            c = canvas.Canvas(output, pagesize=landscape((4 * inch, 6 * inch)))
-                            
-                            for idx in selected_gift_indices:
-                                row = gift_items.loc[idx]
-                                order_obj = row['_order_obj']
-                                item_obj = row['_item_obj']
-                                
-                                generate_gift_note(
-                                    c, 
-                                    order_obj['order_id'],
-                                    order_obj['buyer_name'],
-                                    item_obj['gift_message']
-                                )
-                                c.showPage()
-                            
-                            c.save()
-                            output.seek(0)
+                            notes = [gift_note_data(record) for record in row_records(records, gift_items.loc[selected_gift_indices])]
+                            order_store.mark_printed(item_keys(gift_items.loc[selected_gift_indices]), 'gift_note')
                             
                             st.download_button(
                                 "📥 Download Gift Notes PDF",
-                                output.getvalue(),
+                                render_cached(render_gift_notes, notes, get_page_cache(), 'gift_note', run_timings),
                                 "gift_notes.pdf",
                                 "application/pdf"
                             )
@@ -897,3 +826,26 @@ if uploaded_files:
                 st.info("No orders with gift messages found")
 else:
     st.info("👆 Upload PDF files to get started")
+
+# Diagnostics: stage timings of the last run that did more than rebuild the table
+if set(run_timings.stages) - {'build_table'}:
+    try:
+        st.session_state['last_run'] = run_timings.write_jsonl(**run_info)
+    except OSError as e:
+        st.session_state['last_run'] = None
+        st.warning(f"Could not write the run log: {e}")
+
+with diagnostics:
+    last_run = st.session_state.get('last_run')
+    if last_run:
+        peak = f" · RSS up to {last_run['rss_mb']:.0f} MiB" if last_run['rss_mb'] is not None else ""
+        if last_run['process_peak_rss_mb'] is not None:
+            peak += f" · server peak since start {last_run['process_peak_rss_mb']:.0f} MiB"
+        st.caption(f"Run at {last_run['time']}{peak}")
+        st.dataframe(pd.DataFrame(last_run['stages']), hide_index=True, use_container_width=True)
+        st.caption(f"Runs are appended to {RUN_LOG_PATH}")
+    else:
+        st.caption("Stage timings appear here after a parse, render or export.")
+    job_counts = get_job_queue().status()
+    st.caption("Background jobs: " + (', '.join(f"{count} {status}" for status, count in sorted(job_counts.items()))
+                                      or "none"))
@@ -0,0 +1,195 @@
+"""Watch-folder ingestion of Amazon towel packing slips.
+
+Polls a directory for new PDFs and writes each one's manufacturing labels
+and gift notes to a folder of its own under the output directory:
+    <output>/<name>-<hash>/manufacturing_labels.pdf, gift_notes.pdf
+
+Files are identified by content hash. Processed hashes are recorded in
+<output>/ingested.jsonl, so restarts and re-downloaded copies are skipped.
+New files pass through a bounded queue to a fixed number of worker
+processes: a burst of downloads waits in the queue (and the folder)
+instead of starting more parses at once.
+
+Usage:
+    python towel_watch.py inbox/ -o labels/ [--workers 2] [--queue-size 16] [--interval 5] [--once]
+"""
+import argparse
+import hashlib
+import json
+import os
+import queue
+import signal
+import sys
+import threading
+import time
+from datetime import datetime
+from io import BytesIO
+
+from towel_batch import find_pdfs, write_file
+from towel_core import (
+    DEFAULT_BACKEND,
+    EXTRACTION_BACKENDS,
+    gift_note_data,
+    label_records,
+    parse_towel_orders,
+    process_pool,
+    render_gift_notes,
+    render_manufacturing_labels,
+)
+
+LEDGER_NAME = 'ingested.jsonl'
+DEFAULT_INTERVAL = 5.0  # seconds between folder scans
+DEFAULT_QUEUE_SIZE = 16
+DEFAULT_WATCH_WORKERS = min(os.cpu_count() or 1, 2)
+
+def load_ledger(path):
+    """Content hashes already recorded in the ledger file"""
+    if not os.path.exists(path):
+        return set()
+    with open(path, encoding='utf-8') as f:
+        return {json.loads(line)['sha256'] for line in f if line.strip()}
+
+def ingest_pdf(name, pdf_bytes, digest, output_dir, backend=DEFAULT_BACKEND):
+    """Worker: parse one PDF and write its labels and gift notes; returns its ledger entry"""
+    start = time.perf_counter()
+    entry = {'file': name, 'sha256': digest}
+    try:
+        orders = parse_towel_orders(BytesIO(pdf_bytes), backend)
+    except Exception as e:
+        entry['error'] = str(e)
+        return entry
+
+    labels = label_records(orders)
+    notes = [gift_note_data(record) for record in labels if record['has_gift_note']]
+    target = os.path.join(output_dir, f'{os.path.splitext(name)[0]}-{digest[:8]}')
+    os.makedirs(target, exist_ok=True)
+    if labels:
+        write_file(os.path.join(target, 'manufacturing_labels.pdf'), render_manufacturing_labels(labels))
+    if notes:
+        write_file(os.path.join(target, 'gift_notes.pdf'), render_gift_notes(notes))
+    entry.update(orders=len(orders), items=len(labels), gift_notes=len(notes), output=target,
+                 seconds=round(time.perf_counter() - start, 3))
+    return entry
+
+class FolderWatcher:
+    """Scans input_dir for new PDFs and feeds them through a bounded queue to worker processes"""
+
+    def __init__(self, input_dir, output_dir, workers=DEFAULT_WATCH_WORKERS, queue_size=DEFAULT_QUEUE_SIZE,
+                 backend=DEFAULT_BACKEND):
+        self.input_dir = input_dir
+        self.output_dir = output_dir
+        self.workers = workers
+        self.backend = backend
+        self.queue = queue.Queue(maxsize=queue_size)
+        os.makedirs(output_dir, exist_ok=True)
+        self.ledger_path = os.path.join(output_dir, LEDGER_NAME)
+        self.seen = load_ledger(self.ledger_path)
+        self._pending = set()  # hashes queued or being processed
+        self._signatures = {}  # path -> (size, mtime) at the previous scan
+        self._handled = {}  # path -> (size, mtime) when it was last queued or skipped
+        self._lock = threading.Lock()
+
+    def scan(self, settle=True):
+        """Queue PDFs not processed before; blocks while the queue is full
+
+        With settle, a file is only picked up once its size and modification
+        time are unchanged since the previous scan, so files still being
+        downloaded are left alone.
+        """
+        for path in find_pdfs(self.input_dir):
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            signature = (stat.st_size, stat.st_mtime)
+            previous, self._signatures[path] = self._signatures.get(path), signature
+            if self._handled.get(path) == signature or (settle and previous != signature):
+                continue
+            self._handled[path] = signature
+
+            with open(path, 'rb') as f:
+                pdf_bytes = f.read()
+            digest = hashlib.sha256(pdf_bytes).hexdigest()
+            with self._lock:
+                if digest in self.seen or digest in self._pending:
+                    continue
+                self._pending.add(digest)
+            self.queue.put((os.path.basename(path), pdf_bytes, digest))
+
+    def _record(self, entry):
+        """Append a finished file to the ledger and report it"""
+        with self._lock:
+            with open(self.ledger_path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({'time': datetime.now().isoformat(timespec='seconds'), **entry}) + '\n')
+            self.seen.add(entry['sha256'])
+            self._pending.discard(entry['sha256'])
+        if 'error' in entry:
+            print(f"Error parsing {entry['file']}: {entry['error']}", file=sys.stderr, flush=True)
+        else:
+            print(f"{entry['file']}: {entry['orders']} orders, {entry['items']} labels, "
+                  f"{entry['gift_notes']} gift notes in {entry['seconds']:.1f}s", flush=True)
+
+    def _work(self, pool):
+        """Worker thread: hand queued files to the process pool one at a time"""
+        while True:
+            job = self.queue.get()
+            try:
+                if job is None:
+                    return
+                name, pdf_bytes, digest = job
+                try:
+                    entry = pool.submit(ingest_pdf, name, pdf_bytes, digest, self.output_dir, self.backend).result()
+                except Exception as e:
+                    # The worker process itself failed: not recorded, so the file is retried on restart
+                    print(f"Failed to process {name}: {e}", file=sys.stderr, flush=True)
+                    with self._lock:
+                        self._pending.discard(digest)
+                else:
+                    self._record(entry)
+            finally:
+                self.queue.task_done()
+
+    def run(self, interval=DEFAULT_INTERVAL, once=False):
+        """Scan every interval seconds until interrupted; with once, process the current files and return"""
+        with process_pool(self.workers) as pool:
+            threads = [threading.Thread(target=self._work, args=(pool,), daemon=True) for _ in range(self.workers)]
+            for thread in threads:
+                thread.start()
+            try:
+                while True:
+                    self.scan(settle=not once)
+                    if once:
+                        break
+                    time.sleep(interval)
+            except KeyboardInterrupt:
+                print("Stopping after the files already queued...", flush=True)
+            finally:
+                for _ in threads:
+                    self.queue.put(None)
+                for thread in threads:
+                    thread.join()
+
+def _interrupt(signum, frame):
+    raise KeyboardInterrupt
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Watch a folder and render labels and gift notes for new packing slips")
+    parser.add_argument('input_dir', help="Directory that packing slip PDFs are downloaded into")
+    parser.add_argument('-o', '--output-dir', default='output', help="Directory for generated files (default: output)")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WATCH_WORKERS, help="Files parsed at the same time")
+    parser.add_argument('--queue-size', type=int, default=DEFAULT_QUEUE_SIZE,
+                        help="New files waiting for a worker before scanning pauses")
+    parser.add_argument('--interval', type=float, default=DEFAULT_INTERVAL, help="Seconds between folder scans")
+    parser.add_argument('--backend', default=DEFAULT_BACKEND, choices=sorted(EXTRACTION_BACKENDS),
+                        help="Text extraction backend")
+    parser.add_argument('--once', action='store_true', help="Process the files present now and exit")
+    args = parser.parse_args(argv)
+
+    signal.signal(signal.SIGTERM, _interrupt)  # stop like Ctrl+C under a service manager
+    watcher = FolderWatcher(args.input_dir, args.output_dir, args.workers, args.queue_size, args.backend)
+    print(f"Watching {args.input_dir} ({len(watcher.seen)} files already ingested)", flush=True)
+    watcher.run(args.interval, args.once)
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())